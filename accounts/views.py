@@ -1,12 +1,17 @@
+import logging
+
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
+from django.db import DatabaseError, transaction
 from .forms import CustomUserCreationForm
 
 # Import email verification functions from users app
 from users.views import send_verification_email
 
+logger = logging.getLogger(__name__)
+
 
 def accounts_home(request):
     return render(request, 'accounts/accounts_home.html')
@@ -31,27 +36,31 @@ def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save(commit=False)
-            user.is_active = False  # Deactivate until email verified
-            user.email_verified = False
-            user.save()
-
-            print(f"User created: {user.username} ({user.email})")
-            print("Sending verification email...")
-
-            # Send verification email
+            # Create the user and queue the verification email in one
+            # transaction; the outbox worker sends it.
             try:
-                send_verification_email(request, user)
+                with transaction.atomic():
+                    user = form.save(commit=False)
+                    user.is_active = False  # Deactivate until email verified
+                    user.email_verified = False
+                    user.save()
+                    send_verification_email(request, user)
+
+                logger.info("User created: %s (%s)", user.username, user.email)
                 messages.success(
                     request,
                     "Registration successful! Check your email to verify your account.",
                 )
                 return redirect('home')
-            except Exception as e:
-                print(f"Email send error: {str(e)}")
+            except DatabaseError:
+                # Nothing was saved; keep database details out of the page.
+                logger.exception(
+                    "Registration failed for %s",
+                    form.cleaned_data.get('username'),
+                )
                 messages.error(
                     request,
-                    f"Registration created but email failed to send: {str(e)}",
+                    "Registration failed. Please try again.",
                 )
                 return redirect('home')
     else:
@@ -1,6 +1,21 @@
 from django.contrib import admin
 from .models import Post, Comment
 
+
+class PostAdmin(admin.ModelAdmin):
+    list_display = (
+        'title',
+        'author',
+        'status',
+        'approved_comment_count',
+        'pending_comment_count',
+        'created_on',
+    )
+    list_filter = ('status',)
+    list_select_related = ('author',)
+    search_fields = ('title',)
+
+
 # Register your models here.
-admin.site.register(Post)
+admin.site.register(Post, PostAdmin)
 admin.site.register(Comment)
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post
+from blog.rendering import build_excerpt, has_markup, plain_text
+from blog.search import index_post
+from core.page_cache import invalidate_page_group
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite post excerpts as plain text: rebuild empty excerpts and ones "
+        "cut from raw HTML from the post content, in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Posts processed per transaction (default: 500).",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Rebuild every excerpt from content, including hand-written ones.",
+        )
+
+    def _new_excerpt(self, post, rebuild_all):
+        if rebuild_all or not post.excerpt:
+            return build_excerpt(post.content)
+        if has_markup(post.excerpt):
+            # Excerpts cut from raw HTML may end mid-tag, so rebuild them
+            # from the content instead of stripping the broken fragment.
+            if post.content and post.content.startswith(post.excerpt[:50]):
+                return build_excerpt(post.content)
+            return plain_text(post.excerpt)
+        return post.excerpt
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        rebuild_all = options['all']
+        updated = 0
+        last_pk = 0
+
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .only('pk', 'title', 'status', 'excerpt', 'content')
+                .order_by('pk')[:batch_size]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+
+            changed = []
+            for post in posts:
+                excerpt = self._new_excerpt(post, rebuild_all)
+                if excerpt != post.excerpt:
+                    post.excerpt = excerpt
+                    changed.append(post)
+            if changed:
+                # bulk_update skips post_save, so refresh the search index here.
+                with transaction.atomic():
+                    Post.objects.bulk_update(changed, ['excerpt'])
+                    for post in changed:
+                        index_post(post)
+                updated += len(changed)
+
+        if updated:
+            invalidate_page_group('blog-list')
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} excerpts."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.search import rebuild_index
+from core.page_cache import invalidate_page_group
+
+
+class Command(BaseCommand):
+    help = "Rebuild the blog full-text search index from published posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Posts read from the database per chunk (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_index(batch_size=max(options['batch_size'], 1))
+        # Cached search result pages are tagged with the blog list group.
+        invalidate_page_group('blog-list')
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {indexed} published posts.")
+        )
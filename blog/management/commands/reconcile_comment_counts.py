@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from blog.models import Comment, Post
+
+
+def _comment_total(approved):
+    counts = (
+        Comment.objects.filter(post=OuterRef('pk'), approved=approved)
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = "Recount Post.approved_comment_count and pending_comment_count from comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Posts recounted per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        fixed = 0
+        last_pk = 0
+
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            with transaction.atomic():
+                drifted = list(
+                    Post.objects.filter(pk__in=pks)
+                    .exclude(
+                        approved_comment_count=_comment_total(True),
+                        pending_comment_count=_comment_total(False),
+                    )
+                    .values_list('pk', flat=True)
+                )
+                if drifted:
+                    fixed += Post.objects.filter(pk__in=drifted).update(
+                        approved_comment_count=_comment_total(True),
+                        pending_comment_count=_comment_total(False),
+                    )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Corrected comment counts on {fixed} posts.")
+        )
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_search "
+    "USING fts5(title, excerpt, body, tokenize = 'porter unicode61')"
+)
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS blog_post_search ("
+    "  post_id bigint PRIMARY KEY,"
+    "  body text NOT NULL DEFAULT '',"
+    "  document tsvector NOT NULL"
+    ")",
+    "CREATE INDEX IF NOT EXISTS blog_post_search_document_gin "
+    "ON blog_post_search USING GIN (document)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_CREATE:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS blog_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_alter_comment_options_alter_post_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 4.2.26 on 2026-10-18 18:29
+
+import math
+import re
+from html.parser import HTMLParser
+
+import bleach
+from bleach.css_sanitizer import CSSSanitizer
+from bleach.html5lib_shim import Filter
+from django.db import migrations, models
+
+# A frozen copy of blog.rendering as the data migrations need it, so later
+# changes to the live renderer never change what these migrations do.
+ALLOWED_TAGS = frozenset(bleach.ALLOWED_TAGS) | {
+    'br', 'p', 'div', 'span', 'hr',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'u', 's', 'sub', 'sup', 'pre',
+    'img', 'figure', 'figcaption',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    '*': ['class', 'style'],
+    'a': ['href', 'title', 'target', 'rel'],
+    'abbr': ['title'],
+    'acronym': ['title'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+    'td': ['colspan', 'rowspan'],
+    'th': ['colspan', 'rowspan'],
+}
+ALLOWED_PROTOCOLS = frozenset({'http', 'https', 'mailto'})
+ALLOWED_CSS_PROPERTIES = frozenset({
+    'background-color', 'color', 'float', 'font-family', 'font-size',
+    'font-style', 'font-weight', 'height', 'line-height', 'margin',
+    'margin-bottom', 'margin-left', 'margin-right', 'margin-top',
+    'max-width', 'text-align', 'text-decoration', 'vertical-align', 'width',
+})
+BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl',
+    'dt', 'figcaption', 'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'header', 'hr', 'img', 'li', 'ol', 'p', 'pre', 'section', 'table',
+    'td', 'th', 'tr', 'ul',
+})
+SKIPPED_TAGS = frozenset({'script', 'style'})
+WORDS_PER_MINUTE = 200
+
+_SCRIPT_BLOCKS = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+
+class ContentImageFilter(Filter):
+    def __iter__(self):
+        for token in super().__iter__():
+            if token['type'] in ('StartTag', 'EmptyTag') and token['name'] == 'img':
+                token['data'][(None, 'loading')] = 'lazy'
+                token['data'][(None, 'decoding')] = 'async'
+            yield token
+
+
+class WordCounter(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skipping = max(self._skipping - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def render_content(content):
+    """Return ``(html, word_count, reading_time)`` for ``content``."""
+    cleaner = bleach.Cleaner(
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        protocols=ALLOWED_PROTOCOLS,
+        css_sanitizer=CSSSanitizer(allowed_css_properties=ALLOWED_CSS_PROPERTIES),
+        strip=True,
+        strip_comments=True,
+        filters=[ContentImageFilter],
+    )
+    html = cleaner.clean(_SCRIPT_BLOCKS.sub('', content or ''))
+    counter = WordCounter()
+    counter.feed(html)
+    counter.close()
+    word_count = len(''.join(counter.parts).split())
+    reading_time = math.ceil(word_count / WORDS_PER_MINUTE) if word_count else 0
+    return html, word_count, reading_time
+
+
+def render_existing_posts(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'content').iterator(chunk_size=500):
+        post.content_html, post.word_count, post.reading_time = render_content(post.content)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['content_html', 'word_count', 'reading_time'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['content_html', 'word_count', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Estimated reading time in minutes.'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.26 on 2026-10-18 18:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_existing_comments(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+    Post = apps.get_model('blog', 'Post')
+
+    def total(approved):
+        counts = (
+            Comment.objects.filter(post=OuterRef('pk'), approved=approved)
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    Post.objects.update(
+        approved_comment_count=total(True),
+        pending_comment_count=total(False),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_rendered_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='pending_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_comments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from importlib import import_module
+
+from django.db import migrations
+
+# The renderer frozen alongside the 0006 backfill (which keeps styles).
+render_content = import_module('blog.migrations.0006_post_rendered_content').render_content
+
+
+def rerender_posts(apps, schema_editor):
+    # Sites that ran 0006 before it kept inline styles need a re-render.
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'content').iterator(chunk_size=500):
+        post.content_html = render_content(post.content)[0]
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['content_html'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['content_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_comment_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(rerender_posts, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,19 @@
-from django.db import models
-from django.utils.text import slugify, Truncator
+from django.db import IntegrityError, models, transaction
 from django.urls import reverse
 from cloudinary.models import CloudinaryField
 from django_summernote.fields import SummernoteTextField
 from users.models import CustomUser
 
+from .rendering import build_excerpt, has_markup, plain_text, render_post_content
+from .slugs import unique_slug
+
+SLUG_SAVE_ATTEMPTS = 3
+
+
+def comment_counter_field(approved):
+    """Return the ``Post`` column counting comments with this approval state."""
+    return 'approved_comment_count' if approved else 'pending_comment_count'
+
 
 class Post(models.Model):
     STATUS_CHOICES = [
@@ -22,6 +31,18 @@ class Post(models.Model):
     slug = models.SlugField(max_length=200, unique=True, null=True, blank=True)
     featured_image = CloudinaryField('image', default='placeholder')
     excerpt = models.TextField(blank=True)
+    # Rendered from ``content`` on every save; see blog.rendering.
+    content_html = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Estimated reading time in minutes.",
+    )
+    # Maintained by the Comment signals in blog.signals; see the
+    # reconcile_comment_counts command for repairs.
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
+    pending_comment_count = models.PositiveIntegerField(default=0, editable=False)
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
@@ -36,18 +57,41 @@ class Post(models.Model):
     def __str__(self):
         return f"{self.title} | written by {self.author}"
 
+    def render_content(self):
+        """Refresh the sanitized HTML and reading stats from ``content``."""
+        rendered = render_post_content(self.content)
+        self.content_html = rendered.html
+        self.word_count = rendered.word_count
+        self.reading_time = rendered.reading_time
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title) or "post"
-            slug = base_slug
-            counter = 1
-            while Post.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
         if not self.excerpt and self.content:
-            self.excerpt = Truncator(self.content).chars(300)
-        super().save(*args, **kwargs)
+            self.excerpt = build_excerpt(self.content)
+        elif has_markup(self.excerpt):
+            self.excerpt = plain_text(self.excerpt)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'content_html', 'word_count', 'reading_time',
+                }
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+
+        # Another save can claim the same slug between allocation and
+        # INSERT; the unique index rejects it and we allocate again.
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            self.slug = unique_slug(Post, self.title, exclude_pk=self.pk)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                self.slug = None
+                if attempt == SLUG_SAVE_ATTEMPTS - 1:
+                    raise
 
     def get_absolute_url(self):
         return reverse("post_detail", kwargs={"slug": self.slug})
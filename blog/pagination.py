@@ -0,0 +1,124 @@
+"""Keyset (cursor) pagination helpers for the blog listings."""
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'blog.pagination.cursor'
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset.
+
+    Mirrors the parts of ``django.core.paginator.Page`` the templates use
+    (iteration, ``has_next``/``has_previous``/``has_other_pages``) and adds
+    opaque ``next_cursor``/``previous_cursor`` tokens.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _serialize_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values, direction='next'):
+    """Return an opaque, tamper-proof token for a keyset position."""
+    payload = {'d': direction, 'v': [_serialize_value(v) for v in values]}
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, size):
+    """Return ``(direction, values)`` for ``token`` or ``None`` if invalid."""
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict):
+        return None
+    direction = payload.get('d')
+    values = payload.get('v')
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None
+    if len(values) != size:
+        return None
+    return direction, values
+
+
+def _seek_filter(ordering, values, forward):
+    """Build the lexicographic "after this row" filter for ``ordering``."""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        clause = Q(**{f'{name}__{lookup}': values[index]})
+        for prior_field, prior_value in zip(ordering[:index], values[:index]):
+            clause &= Q(**{prior_field.lstrip('-'): prior_value})
+        condition |= clause
+    return condition
+
+
+def _reverse_ordering(ordering):
+    return [
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    ]
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=10):
+    """Return a ``KeysetPage`` of ``queryset`` sorted by ``ordering``.
+
+    ``ordering`` must end in a unique, non-null column (usually ``id``) so
+    every row has a distinct position. Invalid or missing cursors yield the
+    first page, and each page costs a single ``LIMIT per_page + 1`` query
+    regardless of how deep it is.
+    """
+    ordering = list(ordering)
+    names = [field.lstrip('-') for field in ordering]
+    decoded = decode_cursor(cursor, len(ordering))
+
+    direction, values = decoded if decoded else ('next', None)
+    forward = direction == 'next'
+
+    rows = queryset.order_by(*(ordering if forward else _reverse_ordering(ordering)))
+    if values is not None:
+        rows = rows.filter(_seek_filter(ordering, values, forward))
+    rows = list(rows[:per_page + 1])
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def position(obj):
+        return [getattr(obj, name) for name in names]
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or not forward:
+            next_cursor = encode_cursor(position(rows[-1]), 'next')
+        if (has_more and not forward) or (forward and values is not None):
+            previous_cursor = encode_cursor(position(rows[0]), 'prev')
+
+    return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor)
@@ -0,0 +1,187 @@
+"""Save-time rendering of Summernote post content.
+
+``Post.save`` runs ``render_post_content`` once per save and stores the
+result in denormalized columns, so detail pages output ready-made, sanitized
+HTML without parsing anything per request.
+"""
+import math
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+import bleach
+from bleach.css_sanitizer import CSSSanitizer
+from bleach.html5lib_shim import Filter
+
+ALLOWED_TAGS = frozenset(bleach.ALLOWED_TAGS) | {
+    'br', 'p', 'div', 'span', 'hr',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'u', 's', 'sub', 'sup', 'pre',
+    'img', 'figure', 'figcaption',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    '*': ['class', 'style'],
+    'a': ['href', 'title', 'target', 'rel'],
+    'abbr': ['title'],
+    'acronym': ['title'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+    'td': ['colspan', 'rowspan'],
+    'th': ['colspan', 'rowspan'],
+}
+ALLOWED_PROTOCOLS = frozenset({'http', 'https', 'mailto'})
+# Summernote keeps image size and float, alignment and colours inline.
+ALLOWED_CSS_PROPERTIES = frozenset({
+    'background-color', 'color', 'float', 'font-family', 'font-size',
+    'font-style', 'font-weight', 'height', 'line-height', 'margin',
+    'margin-bottom', 'margin-left', 'margin-right', 'margin-top',
+    'max-width', 'text-align', 'text-decoration', 'vertical-align', 'width',
+})
+
+WORDS_PER_MINUTE = 200
+EXCERPT_LENGTH = 300
+
+# bleach strips disallowed tags but keeps their text; drop these wholesale.
+_SCRIPT_BLOCKS = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+_MARKUP = re.compile(r'<[a-zA-Z/!]|&(?:#\d+|#x[0-9a-fA-F]+|[a-zA-Z]+);')
+
+RenderedContent = namedtuple('RenderedContent', ['html', 'word_count', 'reading_time'])
+
+
+class ContentImageFilter(Filter):
+    """Lazy-load content images and decode them off the main thread."""
+
+    def __iter__(self):
+        for token in super().__iter__():
+            if token['type'] in ('StartTag', 'EmptyTag') and token['name'] == 'img':
+                attrs = token['data']
+                attrs[(None, 'loading')] = 'lazy'
+                attrs[(None, 'decoding')] = 'async'
+            yield token
+
+
+_cleaner = bleach.Cleaner(
+    tags=ALLOWED_TAGS,
+    attributes=ALLOWED_ATTRIBUTES,
+    protocols=ALLOWED_PROTOCOLS,
+    css_sanitizer=CSSSanitizer(allowed_css_properties=ALLOWED_CSS_PROPERTIES),
+    strip=True,
+    strip_comments=True,
+    filters=[ContentImageFilter],
+)
+
+
+# Tags that separate words even without surrounding whitespace.
+BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl',
+    'dt', 'figcaption', 'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'header', 'hr', 'img', 'li', 'ol', 'p', 'pre', 'section', 'table',
+    'td', 'th', 'tr', 'ul',
+})
+SKIPPED_TAGS = frozenset({'script', 'style'})
+
+
+class _LimitReached(Exception):
+    pass
+
+
+class TextExtractor(HTMLParser):
+    """Collect the readable, whitespace-normalized text of an HTML fragment.
+
+    Text is normalized as it streams in, so with a ``limit`` the parser
+    stops as soon as it has one character more than it needs, without
+    reading the rest of the document.
+    """
+
+    def __init__(self, limit=None):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.parts = []
+        self.length = 0
+        self._skipping = 0
+        self._pending_space = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in BLOCK_TAGS:
+            self._pending_space = True
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skipping = max(self._skipping - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self._pending_space = True
+
+    def handle_data(self, data):
+        if self._skipping or not data:
+            return
+        if data[0].isspace():
+            self._pending_space = True
+        for index, word in enumerate(data.split()):
+            if index or self._pending_space:
+                self._append(' ')
+            self._append(word)
+            self._pending_space = False
+        if data[-1].isspace():
+            self._pending_space = True
+
+    def _append(self, text):
+        if text == ' ' and not self.length:
+            return
+        self.parts.append(text)
+        self.length += len(text)
+        if self.limit is not None and self.length > self.limit:
+            raise _LimitReached
+
+    def text(self):
+        return ''.join(self.parts)
+
+
+def _extract(value, limit=None):
+    extractor = TextExtractor(limit=limit)
+    try:
+        extractor.feed(value or '')
+        extractor.close()
+    except _LimitReached:
+        pass
+    return extractor.text()
+
+
+def plain_text(value):
+    """Return the whitespace-normalized text of the HTML in ``value``."""
+    return _extract(value)
+
+
+def build_excerpt(value, max_chars=EXCERPT_LENGTH):
+    """Return a plain-text excerpt of the HTML in ``value``.
+
+    Parses only as much of ``value`` as the excerpt needs and cuts at a word
+    boundary, marking the cut with an ellipsis.
+    """
+    text = _extract(value, limit=max_chars)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    if not text[max_chars].isspace() and ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip(' ,;:.-') + '…'
+
+
+def has_markup(value):
+    """Return whether ``value`` looks like it contains HTML tags or entities."""
+    return bool(_MARKUP.search(value or ''))
+
+
+def sanitize_html(value):
+    """Return ``value`` reduced to the tags and attributes posts may use."""
+    return _cleaner.clean(_SCRIPT_BLOCKS.sub('', value or ''))
+
+
+def render_post_content(content):
+    """Return the sanitized HTML, word count and reading time for ``content``."""
+    sanitized = sanitize_html(content)
+    word_count = len(plain_text(sanitized).split())
+    reading_time = math.ceil(word_count / WORDS_PER_MINUTE) if word_count else 0
+    return RenderedContent(sanitized, word_count, reading_time)
@@ -0,0 +1,284 @@
+"""Full-text search over published blog posts.
+
+Each database vendor keeps its own index table, created by migration
+``0005_post_search_index``:
+
+* SQLite: an FTS5 virtual table ranked with ``bm25()`` and highlighted with
+  ``snippet()``.
+* PostgreSQL: a weighted ``tsvector`` column behind a GIN index, ranked with
+  ``ts_rank_cd()`` and highlighted with ``ts_headline()``.
+
+Other databases fall back to ``icontains`` lookups on ``Post``. The index is
+kept current by the ``Post`` signals in ``blog.signals``, and
+``manage.py rebuild_search_index`` repopulates it from scratch.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .rendering import plain_text
+
+SEARCH_TABLE = 'blog_post_search'
+MAX_QUERY_TERMS = 10
+SNIPPET_WORDS = 24
+
+# Control characters cannot occur in stripped post text, so they mark the
+# highlighted spans until the snippet has been HTML-escaped.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+
+def document_for(post):
+    """Return the ``(title, excerpt, body)`` text indexed for ``post``.
+
+    Titles and excerpts are already plain text; only the content is HTML.
+    """
+    return post.title, post.excerpt, plain_text(post.content)
+
+
+def highlight(snippet):
+    """Escape ``snippet`` and turn the match markers into ``<mark>`` tags."""
+    escaped = escape(snippet or '')
+    return mark_safe(
+        escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    )
+
+
+class SQLiteSearchBackend:
+    def _match(self, query):
+        # Quote every word so user input can never be read as FTS5 syntax.
+        # The porter tokenizer already matches word variants ("aerate",
+        # "aeration"); prefix queries are avoided because expanding a short
+        # prefix over a large index costs far more than the stemmed lookup.
+        terms = re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def index(self, cursor, post_id, title, excerpt, body):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, excerpt, body) '
+            'VALUES (%s, %s, %s, %s)',
+            [post_id, title, excerpt, body],
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id])
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def count(self, cursor, query):
+        match = self._match(query)
+        if not match:
+            return 0
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+            [match],
+        )
+        return cursor.fetchone()[0]
+
+    def search(self, cursor, query, offset, limit):
+        match = self._match(query)
+        if not match:
+            return []
+        cursor.execute(
+            f'SELECT rowid, bm25({SEARCH_TABLE}, 10.0, 4.0, 1.0) AS rank, '
+            f'snippet({SEARCH_TABLE}, -1, %s, %s, %s, %s) '
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+            'ORDER BY rank LIMIT %s OFFSET %s',
+            [_MARK_START, _MARK_END, '…', SNIPPET_WORDS, match, limit, offset],
+        )
+        # bm25() is lower-is-better; flip it so every backend ranks upwards.
+        return [(post_id, -rank, snippet) for post_id, rank, snippet in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    CONFIG = 'english'
+
+    def index(self, cursor, post_id, title, excerpt, body):
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (post_id, body, document) '
+            'VALUES (%s, %s, '
+            'setweight(to_tsvector(%s::regconfig, %s), \'A\') || '
+            'setweight(to_tsvector(%s::regconfig, %s), \'B\') || '
+            'setweight(to_tsvector(%s::regconfig, %s), \'C\')) '
+            'ON CONFLICT (post_id) DO UPDATE '
+            'SET body = EXCLUDED.body, document = EXCLUDED.document',
+            [
+                post_id, body,
+                self.CONFIG, title,
+                self.CONFIG, excerpt,
+                self.CONFIG, body,
+            ],
+        )
+
+    def remove(self, cursor, post_id):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE post_id = %s', [post_id])
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {SEARCH_TABLE}')
+
+    def count(self, cursor, query):
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {SEARCH_TABLE} '
+            'WHERE document @@ websearch_to_tsquery(%s::regconfig, %s)',
+            [self.CONFIG, query],
+        )
+        return cursor.fetchone()[0]
+
+    def search(self, cursor, query, offset, limit):
+        # ts_headline() is expensive, so it only runs on the page of rows
+        # the ranked subquery has already picked out.
+        cursor.execute(
+            'SELECT hit.post_id, hit.rank, '
+            'ts_headline(%s::regconfig, hit.body, hit.query, %s) '
+            'FROM ('
+            f'  SELECT post_id, body, query, ts_rank_cd(document, query) AS rank '
+            f'  FROM {SEARCH_TABLE}, websearch_to_tsquery(%s::regconfig, %s) query '
+            '  WHERE document @@ query '
+            '  ORDER BY rank DESC, post_id DESC LIMIT %s OFFSET %s'
+            ') hit ORDER BY hit.rank DESC, hit.post_id DESC',
+            [
+                self.CONFIG,
+                f'StartSel={_MARK_START}, StopSel={_MARK_END}, '
+                f'MaxWords={SNIPPET_WORDS}, MinWords=12, FragmentDelimiter=…',
+                self.CONFIG, query, limit, offset,
+            ],
+        )
+        return cursor.fetchall()
+
+
+class ORMSearchBackend:
+    """Unindexed fallback for databases without a native full-text index."""
+
+    def index(self, cursor, post_id, title, excerpt, body):
+        pass
+
+    def remove(self, cursor, post_id):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def _queryset(self, query):
+        from .models import Post
+
+        terms = re.findall(r'\w+', query)[:MAX_QUERY_TERMS]
+        posts = Post.objects.filter(status='published')
+        if not terms:
+            return posts.none()
+        for term in terms:
+            posts = posts.filter(
+                Q(title__icontains=term)
+                | Q(excerpt__icontains=term)
+                | Q(content__icontains=term)
+            )
+        return posts.order_by('-created_on', '-id')
+
+    def count(self, cursor, query):
+        return self._queryset(query).count()
+
+    def search(self, cursor, query, offset, limit):
+        posts = self._queryset(query)[offset:offset + limit]
+        return [
+            (post.pk, 0.0, Truncator(plain_text(post.content)).words(SNIPPET_WORDS))
+            for post in posts
+        ]
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    return SEARCH_BACKENDS.get(connection.vendor, ORMSearchBackend)()
+
+
+def index_post(post):
+    """Add, refresh or (for unpublished posts) drop ``post`` in the index."""
+    if post.status != 'published':
+        remove_post(post.pk)
+        return
+    with connection.cursor() as cursor:
+        get_search_backend().index(cursor, post.pk, *document_for(post))
+
+
+def remove_post(post_id):
+    with connection.cursor() as cursor:
+        get_search_backend().remove(cursor, post_id)
+
+
+def rebuild_index(batch_size=500):
+    """Re-index every published post; returns the number indexed."""
+    from .models import Post
+
+    backend = get_search_backend()
+    indexed = 0
+    posts = (
+        Post.objects.filter(status='published')
+        .only('pk', 'title', 'excerpt', 'content')
+        .order_by('pk')
+    )
+    with connection.cursor() as cursor:
+        backend.clear(cursor)
+        for post in posts.iterator(chunk_size=batch_size):
+            backend.index(cursor, post.pk, *document_for(post))
+            indexed += 1
+    return indexed
+
+
+class SearchResults:
+    """Lazy, ranked search results that ``django.core.paginator.Paginator``
+    can page through: ``count()`` and slicing each run one index query.
+
+    Sliced results are ``Post`` objects carrying ``search_rank`` and a
+    highlighted, HTML-safe ``search_snippet``.
+    """
+
+    def __init__(self, query):
+        self.query = (query or '').strip()
+        self.backend = get_search_backend()
+
+    def count(self):
+        if not self.query:
+            return 0
+        with connection.cursor() as cursor:
+            return self.backend.count(cursor, self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults only supports slicing.')
+        offset = index.start or 0
+        limit = (index.stop or offset) - offset
+        if not self.query or limit <= 0:
+            return []
+        with connection.cursor() as cursor:
+            hits = self.backend.search(cursor, self.query, offset, limit)
+        return self._hydrate(hits)
+
+    def _hydrate(self, hits):
+        from .models import Post
+
+        posts = (
+            Post.objects.filter(status='published')
+            .select_related('author')
+            .in_bulk([post_id for post_id, _rank, _snippet in hits])
+        )
+        results = []
+        for post_id, rank, snippet in hits:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.search_rank = rank
+            post.search_snippet = highlight(snippet)
+            results.append(post)
+        return results
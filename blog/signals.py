@@ -0,0 +1,68 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from core.page_cache import invalidate_page_group
+
+from .models import Comment, Post, comment_counter_field
+from .search import index_post, remove_post
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+
+def _bump_comment_counter(post_id, approved, delta):
+    field = comment_counter_field(approved)
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    posts.update(**{field: F(field) + delta})
+    if approved:
+        # The listing and search pages show the approved count, and this
+        # update() bypasses the Post signals that would expire them.
+        invalidate_page_group('blog-list')
+
+
+def _counter_state(instance):
+    # Read from __dict__ so deferred fields never trigger a query.
+    return instance.__dict__.get('post_id'), instance.__dict__.get('approved')
+
+
+@receiver(post_init, sender=Comment)
+def remember_comment_counter_state(sender, instance, **kwargs):
+    instance._counter_state = _counter_state(instance)
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else instance._counter_state
+    if previous is not None and None in previous:
+        # Loaded with ``approved`` deferred, so the stored state is unknown;
+        # reconcile_comment_counts repairs anything this misses.
+        return
+    current = (instance.post_id, instance.approved)
+    if previous == current:
+        return
+    if previous is not None:
+        _bump_comment_counter(*previous, -1)
+    _bump_comment_counter(*current, 1)
+    instance._counter_state = current
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_counters(sender, instance, **kwargs):
+    post_id, approved = instance._counter_state
+    if post_id is None or approved is None:
+        post_id, approved = instance.post_id, instance.approved
+    _bump_comment_counter(post_id, approved, -1)
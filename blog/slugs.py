@@ -0,0 +1,65 @@
+"""Unique slug allocation that costs one query per base slug."""
+import re
+
+from django.utils.text import slugify
+
+SLUG_FALLBACK = 'post'
+
+
+def _base_slug(value, max_length, reserve):
+    base = slugify(value) or SLUG_FALLBACK
+    return base[:max_length - reserve].rstrip('-') or SLUG_FALLBACK
+
+
+def _taken_suffixes(queryset, field, base):
+    """Return the numeric suffixes already used for ``base`` (0 = bare slug)."""
+    pattern = re.compile(rf'^{re.escape(base)}(?:-(\d+))?$')
+    taken = queryset.filter(
+        **{
+            f'{field}__startswith': base,
+            f'{field}__regex': rf'^{base}(-[0-9]+)?$',
+        }
+    ).values_list(field, flat=True)
+
+    suffixes = set()
+    for slug in taken:
+        match = pattern.match(slug)
+        if match:
+            suffixes.add(int(match.group(1) or 0))
+    return suffixes
+
+
+def unique_slug(model, value, field='slug', exclude_pk=None):
+    """Return a ``field`` value for ``value`` that no ``model`` row uses yet.
+
+    Matches ``Post.save``'s scheme (``title``, ``title-1``, ``title-2`` ...)
+    but reads every taken suffix with a single query and takes the next one
+    after the highest. The result can still race with a concurrent insert,
+    so callers should retry on ``IntegrityError``.
+    """
+    return unique_slugs(model, [value], field=field, exclude_pk=exclude_pk)[0]
+
+
+def unique_slugs(model, values, field='slug', exclude_pk=None):
+    """Allocate distinct slugs for many ``values`` at once (for bulk imports).
+
+    Titles that share a base slug cost one query between them, and slugs
+    handed out earlier in the batch are never repeated.
+    """
+    max_length = model._meta.get_field(field).max_length
+    queryset = model._default_manager.all()
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+
+    next_suffix = {}
+    slugs = []
+    for value in values:
+        # Leave room for a "-<n>" suffix of up to 6 digits.
+        base = _base_slug(value, max_length, reserve=7)
+        if base not in next_suffix:
+            taken = _taken_suffixes(queryset, field, base)
+            next_suffix[base] = max(taken) + 1 if taken else 0
+        suffix = next_suffix[base]
+        next_suffix[base] = suffix + 1
+        slugs.append(f'{base}-{suffix}' if suffix else base)
+    return slugs
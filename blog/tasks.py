@@ -0,0 +1,11 @@
+"""Background jobs for ``manage.py run_worker`` (see core.jobs)."""
+from datetime import timedelta
+
+from django.core.management import call_command
+
+from core.jobs import register_job
+
+
+@register_job('blog.reconcile_comment_counts', every=timedelta(hours=24))
+def reconcile_comment_counts():
+    call_command('reconcile_comment_counts')
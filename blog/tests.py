@@ -1,2 +1,453 @@
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.page_cache import PAGE_CACHE_ALIAS
+from users.models import CustomUser
+
+from .models import Comment, Post
+from .rendering import TextExtractor, build_excerpt
+from .search import get_search_backend
+from .slugs import unique_slug, unique_slugs
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class PostListTests(TestCase):
+    def setUp(self):
+        caches[PAGE_CACHE_ALIAS].clear()
+        self.reader = CustomUser.objects.create_user('reader', password='pw')
+        self.other = CustomUser.objects.create_user('other', password='pw')
+        for index in range(8):
+            Post.objects.create(
+                title=f"Other post {index}",
+                content='<p>Body</p>',
+                author=self.other,
+                status='published',
+            )
+        self.mine = Post.objects.create(
+            title='Older own post',
+            content='<p>Mine</p>',
+            author=self.reader,
+            status='published',
+        )
+        Post.objects.filter(pk=self.mine.pk).update(created_on='2000-01-01T00:00Z')
+
+    def test_own_posts_are_listed_first(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('post_list'))
+
+        page = list(response.context['posts'])
+        self.assertEqual(page[0].pk, self.mine.pk)
+        self.assertTrue(page[0].is_mine)
+        self.assertFalse(any(post.is_mine for post in page[1:]))
+        self.assertEqual(len(page), 6)
+
+    def test_anonymous_listing_is_newest_first(self):
+        response = self.client.get(reverse('post_list'), {'page': 2})
+
+        page = list(response.context['posts'])
+        self.assertEqual(page[-1].pk, self.mine.pk)
+        self.assertFalse(any(post.is_mine for post in page))
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        caches[PAGE_CACHE_ALIAS].clear()
+        author = CustomUser.objects.create_user('author', password='pw')
+        self.posts = [
+            Post.objects.create(
+                title=f"Post {index}",
+                content='<p>Body</p>',
+                author=author,
+                status='published',
+            )
+            for index in range(13)
+        ]
+        # Identical timestamps force the id tiebreaker to do its job.
+        Post.objects.update(created_on='2024-05-01T12:00Z')
+
+    def _walk(self, start_params, direction):
+        seen = []
+        params = start_params
+        while True:
+            payload = self.client.get(reverse('post_list'), params).json()
+            seen.append([row['slug'] for row in payload['results']])
+            if not payload[direction]:
+                return seen, payload
+            params = {'format': 'json', 'cursor': payload[direction]}
+
+    def test_cursors_walk_every_post_once_in_both_directions(self):
+        pages, last = self._walk({'format': 'json'}, 'next')
+        slugs = [slug for page in pages for slug in page]
+        expected = [post.slug for post in sorted(self.posts, key=lambda p: -p.pk)]
+        self.assertEqual(slugs, expected)
+        self.assertEqual([len(page) for page in pages], [6, 6, 1])
+
+        back, _ = self._walk({'format': 'json', 'cursor': last['previous']}, 'previous')
+        self.assertEqual(back, [pages[1], pages[0]])
+
+    def test_deep_page_is_a_single_bounded_query(self):
+        _, last = self._walk({'format': 'json'}, 'next')
+        with self.assertNumQueries(1):
+            self.client.get(
+                reverse('post_list'),
+                {'format': 'json', 'cursor': last['previous']},
+            )
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('post_list'), {'cursor': 'bogus'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['posts']), 6)
+        self.assertContains(response, '?cursor=')
+
+    def test_comment_stream_uses_cursors(self):
+        post = self.posts[0]
+        for index in range(25):
+            post.comments.create(content=f"Comment {index}", approved=True)
+
+        first = self.client.get(
+            post.get_absolute_url(), {'format': 'json'}
+        ).json()
+        second = self.client.get(
+            post.get_absolute_url(),
+            {'format': 'json', 'comments_cursor': first['next']},
+        ).json()
+
+        self.assertEqual(len(first['results']), 20)
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        self.assertEqual(second['results'][-1]['content'], 'Comment 0')
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class GuestSessionTests(TestCase):
+    def setUp(self):
+        caches[PAGE_CACHE_ALIAS].clear()
+        self.post = Post.objects.create(
+            title='Readable',
+            content='<p>Body</p>',
+            author=CustomUser.objects.create_user('writer', password='pw'),
+            status='published',
+        )
+
+    def test_reading_a_post_creates_no_session_or_cookie(self):
+        response = self.client.get(self.post.get_absolute_url())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn('site_session_id', response.cookies)
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_commenting_creates_the_guest_session_once(self):
+        response = self.client.post(
+            self.post.get_absolute_url(), {'content': 'Hello there'},
+        )
+
+        self.assertEqual(Session.objects.count(), 1)
+        token = response.cookies['site_session_id'].value
+        self.assertEqual(Comment.objects.get().session_id, token)
+
+        again = self.client.get(self.post.get_absolute_url())
+        self.assertNotIn('site_session_id', again.cookies)
+        self.assertEqual(again.context['guest_session_id'], token)
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class ModerationViewTests(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(
+            'moderator', password='pw', is_staff=True,
+        )
+        self.author = CustomUser.objects.create_user('writer', password='pw')
+        self.client.force_login(self.staff)
+
+    def _post_with_comments(self, slug, count, approved):
+        post = Post.objects.create(
+            title=slug,
+            slug=slug,
+            content='<p>Body</p>',
+            author=self.author,
+            status='published',
+        )
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.author, content=f'c{i}', approved=approved)
+            for i in range(count)
+        )
+        # bulk_create skips the counter signals.
+        call_command('reconcile_comment_counts', stdout=StringIO())
+        return post
+
+    def _queries_for(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_pending_comments_query_count_is_constant(self):
+        url = reverse('blog_pending_comments')
+        self._post_with_comments('first', 1, approved=False)
+        _, baseline = self._queries_for(url)
+
+        for index in range(3):
+            self._post_with_comments(f'busy-{index}', 30, approved=False)
+        response, queries = self._queries_for(url)
+
+        self.assertEqual(queries, baseline)
+        busy = [p for p in response.context['page_obj'] if p.slug.startswith('busy')]
+        self.assertEqual(len(busy[0].moderation_comments), 20)
+        self.assertEqual(busy[0].comment_total, 30)
+
+    def test_with_comments_lists_only_approved_comments(self):
+        post = self._post_with_comments('mixed', 2, approved=True)
+        Comment.objects.create(post=post, content='hidden', approved=False)
+
+        response, _ = self._queries_for(reverse('blog_with_comments'))
+
+        (listed,) = response.context['page_obj']
+        self.assertEqual(len(listed.moderation_comments), 2)
+        self.assertEqual(listed.comment_total, 2)
+
+
+class SlugAllocationTests(TestCase):
+    def _post(self, title, **kwargs):
+        return Post.objects.create(title=title, content='<p>Body</p>', **kwargs)
+
+    def test_duplicate_titles_take_the_next_suffix(self):
+        slugs = [self._post('Lawn care').slug for _ in range(3)]
+        self.assertEqual(slugs, ['lawn-care', 'lawn-care-1', 'lawn-care-2'])
+
+    def test_allocation_is_a_single_query(self):
+        for _ in range(5):
+            self._post('Lawn care')
+        self._post('Lawn care tips')
+
+        with self.assertNumQueries(1):
+            slug = unique_slug(Post, 'Lawn care')
+        self.assertEqual(slug, 'lawn-care-5')
+
+    def test_bulk_allocation_does_not_repeat_slugs(self):
+        self._post('Hedges')
+        self.assertEqual(
+            unique_slugs(Post, ['Hedges', 'Hedges', 'Drains']),
+            ['hedges-1', 'hedges-2', 'drains'],
+        )
+
+    def test_save_retries_when_the_slug_is_taken_concurrently(self):
+        self._post('Aeration')
+        with mock.patch(
+            'blog.models.unique_slug',
+            side_effect=['aeration', 'aeration-1'],
+        ):
+            post = self._post('Aeration')
+        self.assertEqual(post.slug, 'aeration-1')
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class PostSearchTests(TestCase):
+    def setUp(self):
+        caches[PAGE_CACHE_ALIAS].clear()
+        self.author = CustomUser.objects.create_user('writer', password='pw')
+
+    def _post(self, title, content, status='published'):
+        return Post.objects.create(
+            title=title, content=content, author=self.author, status=status,
+        )
+
+    def _search(self, query, **params):
+        return self.client.get(
+            reverse('post_search'), {'q': query, 'format': 'json', **params},
+        ).json()
+
+    def test_ranks_title_matches_first_and_highlights(self):
+        self._post('Drainage basics', '<p>Mention of aeration in passing.</p>')
+        self._post('Lawn aeration guide', '<p>Core <b>aeration</b> relieves compaction.</p>')
+
+        data = self._search('aeration')
+
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['results'][0]['slug'], 'lawn-aeration-guide')
+        self.assertIn('<mark>aeration</mark>', data['results'][0]['snippet'])
+
+    def test_index_follows_status_changes_and_deletes(self):
+        draft = self._post('Hedge trimming', '<p>Shaping hedges</p>', status='draft')
+        self.assertEqual(self._search('hedge')['count'], 0)
+
+        draft.status = 'published'
+        draft.save()
+        self.assertEqual(self._search('hedge')['count'], 1)
+
+        draft.delete()
+        self.assertEqual(self._search('hedge')['count'], 0)
+
+    def test_snippets_escape_post_markup(self):
+        self._post('Garden pests', '<p>weeds &lt;script&gt;alert(1)&lt;/script&gt;</p>')
+
+        snippet = self._search('weeds')['results'][0]['snippet']
+
+        self.assertNotIn('<script>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+
+    def test_search_syntax_in_queries_is_treated_as_text(self):
+        self._post('Mowing', '<p>Stripes</p>')
+        self.assertEqual(self._search('mow"*(')['count'], 1)
+
+    def test_rebuild_command_repopulates_index(self):
+        self._post('Mulching', '<p>Bark mulch</p>')
+        with connection.cursor() as cursor:
+            get_search_backend().clear(cursor)
+        self.assertEqual(self._search('mulch')['count'], 0)
+
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertEqual(self._search('mulch')['count'], 1)
+
+    def test_html_results_page_renders(self):
+        self._post('Patio care', '<p>Sweep the patio</p>')
+        response = self.client.get(reverse('post_search'), {'q': 'patio'})
+        self.assertContains(response, '<mark>')
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class PostRenderingTests(TestCase):
+    def setUp(self):
+        caches[PAGE_CACHE_ALIAS].clear()
+        self.author = CustomUser.objects.create_user('writer', password='pw')
+
+    def test_save_stores_sanitized_html_with_lazy_images(self):
+        post = Post.objects.create(
+            title='Rendered',
+            author=self.author,
+            status='published',
+            content=(
+                '<p onclick="steal()" style="text-align: center; position: fixed">'
+                'Hello <b>there</b></p>'
+                '<img src="https://example.com/a.png" style="width: 50%; float: right">'
+                '<script>alert(1)</script>'
+                '<a href="javascript:alert(1)">link</a>'
+            ),
+        )
+
+        self.assertIn('<b>there</b>', post.content_html)
+        self.assertIn('loading="lazy"', post.content_html)
+        self.assertIn('style="text-align: center;"', post.content_html)
+        self.assertIn('style="width: 50%; float: right;"', post.content_html)
+        self.assertNotIn('position', post.content_html)
+        self.assertNotIn('onclick', post.content_html)
+        self.assertNotIn('alert', post.content_html)
+        self.assertNotIn('javascript:', post.content_html)
+
+    def test_reading_stats_follow_content_updates(self):
+        post = Post.objects.create(
+            title='Long read', author=self.author, content='<p>word</p>' * 450,
+        )
+        self.assertEqual((post.word_count, post.reading_time), (450, 3))
+
+        post.content = '<p>Short now</p>'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual((post.word_count, post.reading_time), (2, 1))
+        self.assertEqual(post.content_html, '<p>Short now</p>')
+
+    def test_detail_page_serves_stored_html(self):
+        post = Post.objects.create(
+            title='Stored', author=self.author, status='published',
+            content='<p>Original</p>',
+        )
+        Post.objects.filter(pk=post.pk).update(content_html='<p>Prerendered</p>')
+
+        response = self.client.get(post.get_absolute_url())
+
+        self.assertContains(response, '<p>Prerendered</p>')
+        self.assertNotContains(response, 'Original')
+
+
+class CommentCounterTests(TestCase):
+    def setUp(self):
+        self.post = Post.objects.create(
+            title='Counted',
+            content='<p>Body</p>',
+            author=CustomUser.objects.create_user('writer', password='pw'),
+            status='published',
+        )
+
+    def _counts(self):
+        self.post.refresh_from_db()
+        return self.post.approved_comment_count, self.post.pending_comment_count
+
+    def test_counters_follow_create_approve_and_delete(self):
+        comment = Comment.objects.create(post=self.post, content='Hi')
+        Comment.objects.create(post=self.post, content='Hello', approved=True)
+        self.assertEqual(self._counts(), (1, 1))
+
+        comment.approved = True
+        comment.save()
+        self.assertEqual(self._counts(), (2, 0))
+
+        comment.content = 'Edited'
+        comment.save()
+        self.assertEqual(self._counts(), (2, 0))
+
+        Comment.objects.get(pk=comment.pk).delete()
+        self.assertEqual(self._counts(), (1, 0))
+
+    def test_reconcile_command_repairs_drift(self):
+        Comment.objects.create(post=self.post, content='Hi', approved=True)
+        Post.objects.filter(pk=self.post.pk).update(
+            approved_comment_count=7, pending_comment_count=3,
+        )
+
+        out = StringIO()
+        call_command('reconcile_comment_counts', stdout=out)
+
+        self.assertEqual(self._counts(), (1, 0))
+        self.assertIn('Corrected comment counts on 1 posts.', out.getvalue())
+
+
+class ExcerptTests(TestCase):
+    def test_excerpt_is_plain_text_cut_at_a_word(self):
+        post = Post.objects.create(
+            title='Excerpted',
+            content='<p>Lawn <b>care</b> &amp; feeding.</p>' + '<p>More words here.</p>' * 40,
+        )
+
+        self.assertTrue(post.excerpt.startswith('Lawn care & feeding. More words'))
+        self.assertNotIn('<', post.excerpt)
+        self.assertLessEqual(len(post.excerpt), 301)
+        self.assertTrue(post.excerpt.endswith('…'))
+
+    def test_build_excerpt_stops_parsing_at_the_limit(self):
+        extractor = TextExtractor(limit=20)
+        with self.assertRaises(Exception):
+            extractor.feed('<p>' + 'word ' * 1000 + '</p>')
+        self.assertLess(extractor.length, 30)
+        self.assertEqual(build_excerpt('<p>one two three</p>', max_chars=9), 'one two…')
+
+    def test_backfill_rebuilds_html_excerpts(self):
+        post = Post.objects.create(title='Old', content='<p>Old <i>style</i> post</p>')
+        Post.objects.filter(pk=post.pk).update(excerpt='<p>Old <i>style</i> po')
+
+        call_command('backfill_excerpts', batch_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'Old style post')
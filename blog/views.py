@@ -2,19 +2,41 @@ from django import forms
 from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponseNotAllowed, HttpResponseForbidden
+from django.http import HttpResponseNotAllowed, HttpResponseForbidden, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    When,
+)
 from django.contrib import messages
 from django.utils.text import Truncator
 
-from .models import Post, Comment
+from .models import Post, Comment, comment_counter_field
 from .forms import PostForm
+from .pagination import keyset_paginate
+from .search import SearchResults
+from core.page_cache import cache_anonymous_page
 from users.models import BloggerRequest
 
 SITE_SESSION_COOKIE = 'site_session_id'
 SITE_SESSION_COOKIE_MAX_AGE = 60 * 60 * 24 * 365  # 1 year
 
+POSTS_PER_PAGE = 6
+POST_LIST_ORDERING = ('-is_mine', '-created_on', '-id')
+COMMENTS_PER_PAGE = 20
+COMMENT_ORDERING = ('-created_at', '-id')
+MODERATION_POSTS_PER_PAGE = 10
+MODERATION_COMMENTS_PER_POST = 20
+SEARCH_RESULTS_PER_PAGE = 10
+
+
 def _queue_blogger_request(user, post):
     if not user or not user.is_authenticated:
         return
@@ -50,9 +72,12 @@ def _get_site_session_cookie(request):
     return request.COOKIES.get(SITE_SESSION_COOKIE)
 
 
-def _set_site_session_cookie(response, session_token):
+def _set_site_session_cookie(response, session_token, request=None):
     if not session_token:
         return response
+    if request is not None and _get_site_session_cookie(request) == session_token:
+        # Unchanged cookie: skip the Set-Cookie so the response stays cacheable.
+        return response
     response.set_cookie(
         SITE_SESSION_COOKIE,
         session_token,
@@ -69,9 +94,8 @@ def _guest_session_tokens(request):
     if cookie_token:
         tokens.append(cookie_token)
 
+    # Only read an existing session; guests get one when they first comment.
     session_key = request.session.session_key
-    if not session_key:
-        session_key = _ensure_session_key(request)
     if session_key:
         tokens.append(session_key)
 
@@ -101,29 +125,81 @@ def _can_manage_comment(request, comment):
     return any(comment.session_id == token for token in session_tokens)
 
 
+def _wants_json(request):
+    return request.GET.get('format') == 'json'
+
+
+def _post_payload(post):
+    author = post.author
+    return {
+        'title': post.title,
+        'slug': post.slug,
+        'url': post.get_absolute_url(),
+        'excerpt': post.excerpt,
+        'author': author.get_full_name() or author.username if author else None,
+        'created_on': post.created_on.isoformat(),
+        'reading_time': post.reading_time,
+        'comment_count': post.approved_comment_count,
+        'is_mine': bool(getattr(post, 'is_mine', False)),
+    }
+
+
+def _comment_payload(comment):
+    author = comment.author
+    if author:
+        display_name = author.get_full_name() or author.username
+    else:
+        display_name = comment.name or 'Guest'
+    return {
+        'id': comment.pk,
+        'author': display_name,
+        'content': comment.content,
+        'created_at': comment.created_at.isoformat(),
+    }
+
+
+@cache_anonymous_page(['blog-list'])
 def post_list(request):
     """Public list of published posts with pagination (6 per page)."""
+    # Flag the logged-in user's posts in SQL so they sort first and the
+    # paginator only ever loads a single page of rows.
+    if request.user.is_authenticated:
+        is_mine = Case(
+            When(author_id=request.user.pk, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    else:
+        is_mine = Value(False, output_field=BooleanField())
+
     posts = (
         Post.objects.filter(status='published')
-        .order_by('-created_on')
+        .select_related('author')
+        .annotate(is_mine=is_mine)
     )
 
-    # Sort so logged-in user's posts appear first
-    if request.user.is_authenticated:
-        user_posts = [p for p in posts if p.author == request.user]
-        other_posts = [p for p in posts if p.author != request.user]
-        posts = user_posts + other_posts
-
-    # Mark posts that belong to the logged-in user
-    for post in posts:
-        post.is_mine = (
-            request.user.is_authenticated and post.author == request.user
+    # Legacy ?page=N links keep the numbered paginator; everything else uses
+    # keyset cursors so deep pages cost the same as the first one.
+    page_number = request.GET.get('page')
+    if page_number and not _wants_json(request):
+        paginator = Paginator(posts.order_by(*POST_LIST_ORDERING), POSTS_PER_PAGE)
+        page_obj = paginator.get_page(page_number)
+    else:
+        page_obj = keyset_paginate(
+            posts,
+            POST_LIST_ORDERING,
+            cursor=request.GET.get('cursor'),
+            per_page=POSTS_PER_PAGE,
         )
 
-    # Paginate with 6 posts per page
-    paginator = Paginator(posts, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if _wants_json(request):
+        return JsonResponse(
+            {
+                'results': [_post_payload(post) for post in page_obj],
+                'next': page_obj.next_cursor,
+                'previous': page_obj.previous_cursor,
+            }
+        )
 
     is_blogger = (
         request.user.is_authenticated
@@ -142,6 +218,39 @@ def post_list(request):
     )
 
 
+@cache_anonymous_page(['blog-list'])
+def post_search(request):
+    """Ranked full-text search over published posts (``?q=``)."""
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), SEARCH_RESULTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    if _wants_json(request):
+        return JsonResponse(
+            {
+                'query': query,
+                'count': paginator.count,
+                'page': page_obj.number,
+                'num_pages': paginator.num_pages,
+                'results': [
+                    {**_post_payload(post), 'snippet': post.search_snippet}
+                    for post in page_obj
+                ],
+            }
+        )
+
+    return render(
+        request,
+        'blog/post_search.html',
+        {
+            'query': query,
+            'page_obj': page_obj,
+            'posts': page_obj,
+            'result_count': paginator.count,
+        },
+    )
+
+
 def start_writing(request):
     is_blogger = (
         request.user.is_authenticated
@@ -191,6 +300,15 @@ def start_writing(request):
     )
 
 
+def _post_page_groups(request, slug):
+    return ['blog-list', f'post:{slug}']
+
+
+@cache_anonymous_page(
+    _post_page_groups,
+    vary_cookies=(SITE_SESSION_COOKIE, settings.SESSION_COOKIE_NAME),
+    csrf_cookie=True,
+)
 def post_detail(request, slug):
     post = get_object_or_404(
         Post,
@@ -198,9 +316,9 @@ def post_detail(request, slug):
         status='published',
     )
 
+    # Read-only visits never create a session; one is only saved below when
+    # a guest actually posts a comment.
     session_key = request.session.session_key
-    if not session_key:
-        session_key = _ensure_session_key(request)
 
     site_session_cookie = _get_site_session_cookie(request)
     guest_session_id = None
@@ -233,6 +351,7 @@ def post_detail(request, slug):
                         anon_session
                         or site_session_cookie
                         or session_key
+                        or _ensure_session_key(request)
                     )
                 if session_identifier and hasattr(comment, 'session_id'):
                     comment.session_id = session_identifier
@@ -260,16 +379,36 @@ def post_detail(request, slug):
                     response = redirect(post.get_absolute_url() + '#comments')
 
                 if not request.user.is_authenticated:
-                    response = _set_site_session_cookie(response, guest_session_id)
+                    response = _set_site_session_cookie(
+                        response,
+                        guest_session_id,
+                        request,
+                    )
                 return response
 
-    comments = post.comments.filter(approved=True).order_by('-created_at')
+    approved_comments = post.comments.filter(approved=True)
+    comments = keyset_paginate(
+        approved_comments.select_related('author'),
+        COMMENT_ORDERING,
+        cursor=request.GET.get('comments_cursor'),
+        per_page=COMMENTS_PER_PAGE,
+    )
+    if _wants_json(request):
+        return JsonResponse(
+            {
+                'results': [_comment_payload(comment) for comment in comments],
+                'next': comments.next_cursor,
+                'previous': comments.previous_cursor,
+            }
+        )
+
     response = render(
         request,
         'blog/post_detail.html',
         {
             'post': post,
             'comments': comments,
+            'comment_count': post.approved_comment_count,
             'guest_session_id': guest_session_id,
         },
     )
@@ -277,6 +416,7 @@ def post_detail(request, slug):
         response = _set_site_session_cookie(
             response,
             guest_session_id or site_session_cookie or session_key,
+            request,
         )
     return response
 
@@ -333,7 +473,6 @@ def comment_delete(request, slug, pk):
 
     is_xhr = request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest'
     if is_xhr:
-        from django.http import JsonResponse
         return JsonResponse({'deleted': True})
 
     return redirect(post.get_absolute_url())
@@ -344,44 +483,67 @@ def create_post(request):
     return HttpResponseNotAllowed(['GET', 'POST'])
 
 
+def _moderation_page(request, posts, approved):
+    """Return one page of ``posts`` with up to ``MODERATION_COMMENTS_PER_POST``
+    of their comments (approved or not) attached as ``moderation_comments``.
+
+    The page costs a count, the posts and one windowed comment query however
+    many comments are waiting; totals come from the denormalized counters.
+    """
+    comments = (
+        Comment.objects.filter(approved=approved)
+        .select_related('author')
+        .order_by(*COMMENT_ORDERING)
+    )
+    posts = (
+        posts.select_related('author')
+        .annotate(comment_total=F(comment_counter_field(approved)))
+        .prefetch_related(
+            Prefetch(
+                'comments',
+                queryset=comments[:MODERATION_COMMENTS_PER_POST],
+                to_attr='moderation_comments',
+            )
+        )
+        .order_by('-created_on', '-id')
+    )
+    paginator = Paginator(posts, MODERATION_POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
+
+
 @staff_member_required
 def blog_with_comments(request):
-    posts = (
-        Post.objects.filter(status='published')
-        .order_by('-created_on')
-        .prefetch_related('comments')
+    page_obj = _moderation_page(
+        request,
+        Post.objects.filter(status='published'),
+        approved=True,
     )
-    posts_with_comments = [
-        (post, post.comments.filter(approved=True).order_by('-created_at'))
-        for post in posts
-    ]
 
     return render(
         request,
         'blog/blog_with_comments.html',
         {
-            'posts_with_comments': posts_with_comments,
+            'page_obj': page_obj,
+            'posts_with_comments': page_obj,
         },
     )
 
 
 @staff_member_required
 def blog_pending_comments(request):
-    posts = (
-        Post.objects.filter(comments__approved=False)
-        .distinct()
-        .order_by('-created_on')
+    pending = Comment.objects.filter(post=OuterRef('pk'), approved=False)
+    page_obj = _moderation_page(
+        request,
+        Post.objects.filter(Exists(pending)),
+        approved=False,
     )
-    posts_with_unapproved_comments = [
-        (post, post.comments.filter(approved=False).order_by('-created_at'))
-        for post in posts
-    ]
 
     return render(
         request,
         'blog/blog_pending_comments.html',
         {
-            'posts_with_unapproved_comments': posts_with_unapproved_comments,
+            'page_obj': page_obj,
+            'posts_with_unapproved_comments': page_obj,
         },
     )
 
@@ -0,0 +1,198 @@
+"""Optional guest-cart stores that keep anonymous carts out of the database.
+
+``GUEST_CART_BACKEND`` selects the store:
+
+* ``'db'`` (default) keeps the original behaviour: ``CartItem`` rows keyed
+  by the session key.
+* ``'cookie'`` keeps the cart lines in a signed cookie.
+* ``'cache'`` keeps the cart lines in the default cache, keyed by a random
+  token held in a signed cookie.
+
+With a store enabled, nothing touches ``CartItem``/``Booking`` until the
+guest checks out or logs in.
+"""
+import abc
+import datetime
+import hashlib
+import json
+import secrets
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from services.catalog import catalog
+from services.models import Service
+
+from .models import ZERO, CartItem
+
+GUEST_CART_COOKIE = 'guest_cart'
+GUEST_CART_SALT = 'bookings.guest_cart'
+GUEST_CART_MAX_AGE = 60 * 60 * 24 * 14  # 2 weeks
+GUEST_CART_MAX_LINES = 50
+
+
+class BaseGuestCart(abc.ABC):
+    """Cart lines keyed by ``(service_id, size, date)`` in insertion order."""
+
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+        self.cart_id, self.lines = self.load()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add(self, service_id, size, quantity, date=None):
+        if quantity <= 0:
+            return
+        key = (service_id, size, date.isoformat() if date else None)
+        if key not in self.lines and len(self.lines) >= GUEST_CART_MAX_LINES:
+            return
+        self.lines[key] = self.lines.get(key, 0) + quantity
+        self.modified = True
+
+    def clear(self):
+        if self.lines:
+            self.lines = {}
+            self.modified = True
+
+    def rows(self):
+        """Return unsaved ``CartItem`` objects (newest first) priced from the catalog.
+
+        Each row carries the same ``unit_price``/``line_total`` attributes as
+        ``CartItem.objects.with_line_totals()``, so templates and
+        ``_serialize_cart`` treat both storage styles alike.
+        """
+        rows = []
+        for (service_id, size, date), quantity in reversed(self.lines.items()):
+            entry = catalog.get(service_id)
+            if entry is None:
+                continue
+            item = CartItem(
+                service=Service(id=entry.id, name=entry.name),
+                size=size,
+                quantity=quantity,
+                date=datetime.date.fromisoformat(date) if date else None,
+            )
+            item.unit_price = entry.prices.get(size) or ZERO
+            item.line_total = item.unit_price * quantity
+            rows.append(item)
+        return rows
+
+    @staticmethod
+    def total(rows):
+        return sum((row.line_total for row in rows), Decimal(ZERO))
+
+    def fingerprint(self):
+        raw = json.dumps([self.cart_id, self._dump_lines()])
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def _dump_lines(self):
+        return [[s, z, d, q] for (s, z, d), q in self.lines.items()]
+
+    @staticmethod
+    def _parse_lines(raw_lines):
+        lines = {}
+        for raw in raw_lines or []:
+            try:
+                service_id, size, date, quantity = raw
+                if date:
+                    datetime.date.fromisoformat(date)
+                lines[(int(service_id), str(size), date or None)] = int(quantity)
+            except (TypeError, ValueError):
+                continue
+        return lines
+
+    def _cookie_value(self):
+        return self.request.get_signed_cookie(
+            GUEST_CART_COOKIE,
+            default=None,
+            salt=GUEST_CART_SALT,
+            max_age=GUEST_CART_MAX_AGE,
+        )
+
+    def _set_cookie(self, response, value):
+        response.set_signed_cookie(
+            GUEST_CART_COOKIE,
+            value,
+            salt=GUEST_CART_SALT,
+            max_age=GUEST_CART_MAX_AGE,
+            samesite='Lax',
+            httponly=True,
+            secure=getattr(settings, 'SESSION_COOKIE_SECURE', False),
+        )
+
+    @abc.abstractmethod
+    def load(self):
+        """Return ``(cart_id, lines)`` read from the request."""
+
+    @abc.abstractmethod
+    def store(self, response):
+        """Persist the cart (or forget it when empty) on ``response``."""
+
+
+class SignedCookieGuestCart(BaseGuestCart):
+    """Store the whole cart in a signed cookie; no server-side state at all."""
+
+    def load(self):
+        value = self._cookie_value()
+        try:
+            payload = json.loads(value) if value else {}
+        except ValueError:
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+        cart_id = payload.get('id') or secrets.token_urlsafe(12)
+        return cart_id, self._parse_lines(payload.get('lines'))
+
+    def store(self, response):
+        if not self.lines:
+            response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+            return
+        payload = json.dumps(
+            {'id': self.cart_id, 'lines': self._dump_lines()},
+            separators=(',', ':'),
+        )
+        self._set_cookie(response, payload)
+
+
+class CacheGuestCart(BaseGuestCart):
+    """Store the cart in the default cache behind a signed token cookie."""
+
+    def _cache_key(self, cart_id):
+        return f'guest-cart:{cart_id}'
+
+    def load(self):
+        cart_id = self._cookie_value()
+        if not cart_id:
+            return secrets.token_urlsafe(12), {}
+        return cart_id, self._parse_lines(cache.get(self._cache_key(cart_id)))
+
+    def store(self, response):
+        key = self._cache_key(self.cart_id)
+        if not self.lines:
+            cache.delete(key)
+            response.delete_cookie(GUEST_CART_COOKIE, samesite='Lax')
+            return
+        cache.set(key, self._dump_lines(), GUEST_CART_MAX_AGE)
+        self._set_cookie(response, self.cart_id)
+
+
+GUEST_CART_BACKENDS = {
+    'cookie': SignedCookieGuestCart,
+    'cache': CacheGuestCart,
+}
+
+
+def get_guest_cart_class():
+    """Return the configured store class, or ``None`` for database carts."""
+    backend = getattr(settings, 'GUEST_CART_BACKEND', 'db')
+    return GUEST_CART_BACKENDS.get(backend)
+
+
+def get_guest_cart(request):
+    """Return the request's guest cart store, or ``None`` when not in use."""
+    if request.user.is_authenticated:
+        return None
+    return getattr(request, 'guest_cart', None)
@@ -0,0 +1,20 @@
+"""Middleware for the optional guest-cart stores."""
+from .guest_cart import get_guest_cart_class
+
+
+class GuestCartMiddleware:
+    """Attach ``request.guest_cart`` and persist it when a view changes it."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cart_class = get_guest_cart_class()
+        request.guest_cart = cart_class(request) if cart_class else None
+
+        response = self.get_response(request)
+
+        guest_cart = request.guest_cart
+        if guest_cart is not None and guest_cart.modified:
+            guest_cart.store(response)
+        return response
@@ -1,5 +1,20 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Sum,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Coalesce
 
+from services.catalog import catalog
 from services.models import Service  # import from services app
 from users.models import CustomUser
 
@@ -11,6 +26,50 @@ SIZE_CHOICES = [
 ]
 
 
+MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Decimal('0.00')
+
+
+def _line_total():
+    return ExpressionWrapper(F('unit_price') * F('quantity'), output_field=MONEY_FIELD)
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_unit_price(self):
+        """Annotate ``unit_price``: the service price matching each row's size."""
+        return self.annotate(
+            unit_price=Coalesce(
+                Case(
+                    *(
+                        When(size=size, then=F(f'service__{size}_price'))
+                        for size, _label in SIZE_CHOICES
+                    ),
+                    output_field=MONEY_FIELD,
+                ),
+                Value(ZERO),
+                output_field=MONEY_FIELD,
+            )
+        )
+
+    def with_line_totals(self):
+        """Annotate ``unit_price``, ``line_total`` and the whole ``cart_total``.
+
+        ``cart_total`` is a window ``Sum`` over the filtered rows, so the
+        rows and the total arrive in one query.
+        """
+        return self.with_unit_price().annotate(
+            line_total=_line_total(),
+            cart_total=Window(Sum(_line_total()), output_field=MONEY_FIELD),
+        )
+
+    def totals(self):
+        """Return ``{'total': Decimal, 'count': int}`` aggregated in SQL."""
+        return self.with_unit_price().aggregate(
+            total=Coalesce(Sum(_line_total()), Value(ZERO), output_field=MONEY_FIELD),
+            count=Count('pk'),
+        )
+
+
 class CartItem(models.Model):
     user = models.ForeignKey(
         CustomUser,
@@ -34,8 +93,10 @@ class CartItem(models.Model):
     date = models.DateField(null=True, blank=True)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartItemQuerySet.as_manager()
+
     def total_price(self):
-        return self.quantity * self.service.get_price(self.size)
+        return self.quantity * (catalog.price(self.service_id, self.size) or 0)
 
     def __str__(self):
         return f"{self.service.name} ({self.size}) x{self.quantity}"
@@ -71,10 +132,25 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def total_price(self):
-        return self.quantity * self.service.get_price(self.size)
+        return self.quantity * (catalog.price(self.service_id, self.size) or 0)
 
     def __str__(self):
         return (
             f"Booking: {self.service.name} ({self.size}) x{self.quantity} - "
             f"{self.status}"
         )
+
+
+class GuestCheckout(models.Model):
+    """One row per booked guest cart, keyed by the cart's fingerprint.
+
+    Stored guest carts live in a cookie or the cache, so there are no rows
+    to lock at checkout; the unique ``fingerprint`` makes the database
+    refuse a second booking of the same cart from any worker.
+    """
+
+    fingerprint = models.CharField(max_length=32, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Guest checkout {self.fingerprint}"
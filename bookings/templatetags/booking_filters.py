@@ -1,11 +1,13 @@
 from django import template
 
+from services.catalog import catalog
+
 register = template.Library()
 
 
 @register.filter
 def get_price(service, size):
-    """Get price for a service based on size."""
+    """Get price for a service (instance or id) based on size."""
     if service is None:
         return 0
-    return service.get_price(size)
+    return catalog.price(getattr(service, 'pk', service), size)
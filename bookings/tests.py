@@ -1,2 +1,338 @@
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import bump_version
+from services.catalog import (
+    CATALOG_CACHE_ALIAS,
+    CATALOG_VERSION_KEY,
+    ServiceCatalog,
+    catalog,
+)
+from services.models import Service
+from users.models import CustomUser
+
+from .models import Booking, CartItem
+from .utils import GUEST_CART_SESSION_KEY, migrate_guest_cart_to_user
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('buyer', password='pw')
+        self.services = [
+            Service.objects.create(name=f"Service {index}", small_price='10.00')
+            for index in range(5)
+        ]
+        self.client.force_login(self.user)
+
+    def _fill_cart(self):
+        for service in self.services:
+            CartItem.objects.create(user=self.user, service=service, quantity=2)
+
+    def test_confirm_cart_books_every_item_and_clears_the_cart(self):
+        self._fill_cart()
+
+        response = self.client.get(reverse('confirm_cart'))
+
+        self.assertEqual(response.context['booking_count'], 5)
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 5)
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+
+    def test_double_submit_does_not_duplicate_bookings(self):
+        self._fill_cart()
+
+        self.client.get(reverse('confirm_cart'))
+        response = self.client.get(reverse('confirm_cart'))
+
+        self.assertEqual(response.context['booking_count'], 0)
+        self.assertEqual(Booking.objects.count(), 5)
+
+    def _checkout_queries(self, service_count):
+        from .views import _cart_queryset, _finalize_cart_items
+
+        for service in self.services[:service_count]:
+            CartItem.objects.create(user=self.user, service=service)
+        request = self.client.get(reverse('view_cart')).wsgi_request
+        with CaptureQueriesContext(connection) as queries:
+            bookings = _finalize_cart_items(_cart_queryset(request), user=self.user)
+        self.assertEqual(len(bookings), service_count)
+        self.assertTrue(all(booking.pk for booking in bookings))
+        return len(queries)
+
+    def test_checkout_query_count_does_not_grow_with_cart_size(self):
+        self._checkout_queries(1)  # first checkout of the day creates the rollup row
+        self.assertEqual(self._checkout_queries(1), self._checkout_queries(5))
+
+
+class AddToCartAjaxTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('shopper', password='pw')
+        self.services = [
+            Service.objects.create(name=f"Service {index}", small_price='5.00')
+            for index in range(10)
+        ]
+        self.client.force_login(self.user)
+
+    def _post(self, items):
+        return self.client.post(
+            reverse('add_to_cart_ajax'),
+            data=json.dumps({'items': items}),
+            content_type='application/json',
+        )
+
+    def test_merges_ids_names_and_existing_rows(self):
+        existing = CartItem.objects.create(
+            user=self.user, service=self.services[0], quantity=1,
+        )
+
+        response = self._post([
+            {'service_id': self.services[0].pk, 'quantity': 2},
+            {'service_name': 'SERVICE 0', 'quantity': 3},
+            {'service_id': self.services[1].pk, 'quantity': 1},
+            {'service_id': 9999, 'quantity': 1},
+        ])
+
+        payload = response.json()
+        self.assertEqual(payload['added'], 3)
+        existing.refresh_from_db()
+        self.assertEqual(existing.quantity, 6)
+        self.assertEqual(CartItem.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(payload['cart']['count'], 2)
+        self.assertEqual(payload['cart']['total'], 35.0)
+
+    def test_query_count_does_not_grow_with_line_count(self):
+        def queries_for(services):
+            CartItem.objects.all().delete()
+            items = [{'service_id': s.pk, 'quantity': 1} for s in services]
+            items += [{'service_name': s.name, 'quantity': 1} for s in services]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self._post(items).status_code, 200)
+            return len(queries)
+
+        queries_for(self.services[:1])  # warm the service price catalog
+        self.assertEqual(queries_for(self.services[:1]), queries_for(self.services))
+
+
+class ServiceCatalogTests(TestCase):
+    def test_prices_come_from_the_catalog_until_a_service_changes(self):
+        service = Service.objects.create(name='Hedges', small_price='12.50')
+        item = CartItem(service_id=service.pk, size='small', quantity=2)
+
+        self.assertEqual(str(item.total_price()), '25.00')
+        with self.assertNumQueries(0):
+            item.total_price()
+
+        service.small_price = '20.00'
+        service.save()
+        self.assertEqual(str(item.total_price()), '40.00')
+
+    def test_services_saved_by_another_worker_are_seen(self):
+        known = Service.objects.create(name='Hedges', small_price='12.50')
+        catalog.get(known.pk)  # load the snapshot
+
+        # Queryset writes skip this process's signals, like a save elsewhere.
+        [created] = Service.objects.bulk_create([Service(name='Gutters', small_price='30.00')])
+        self.assertEqual(catalog.price(created.pk, 'small'), Decimal('30.00'))
+
+        Service.objects.filter(pk=known.pk).update(small_price='15.00')
+        self.assertEqual(catalog.price(known.pk, 'small'), Decimal('12.50'))
+        # The other worker's signal bumps the shared version.
+        bump_version(caches[CATALOG_CACHE_ALIAS], CATALOG_VERSION_KEY)
+        self.assertEqual(catalog.price(known.pk, 'small'), Decimal('15.00'))
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('totals', password='pw')
+        service = Service.objects.create(
+            name='Patio', small_price='0.10', medium_price='0.20', large_price=None,
+        )
+        CartItem.objects.create(user=self.user, service=service, size='small', quantity=3)
+        CartItem.objects.create(user=self.user, service=service, size='medium', quantity=1)
+        CartItem.objects.create(user=self.user, service=service, size='large', quantity=4)
+
+    def test_totals_are_exact_decimals_computed_in_sql(self):
+        cart = CartItem.objects.filter(user=self.user)
+
+        self.assertEqual(cart.totals(), {'total': Decimal('0.50'), 'count': 3})
+        rows = list(cart.with_line_totals().order_by('pk'))
+        self.assertEqual([row.line_total for row in rows], [
+            Decimal('0.30'), Decimal('0.20'), Decimal('0.00'),
+        ])
+        self.assertEqual({row.cart_total for row in rows}, {Decimal('0.50')})
+
+    def test_cart_summary_prices_the_cart_in_a_single_query(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('cart_summary'))  # warm the service price catalog
+
+        with CaptureQueriesContext(connection) as queries:
+            payload = self.client.get(reverse('cart_summary')).json()
+
+        # One aggregate for the ETag fingerprint, one for the priced rows.
+        cart_queries = [q for q in queries if 'bookings_cartitem' in q['sql']]
+        self.assertEqual(len(cart_queries), 2)
+        self.assertEqual(payload['total'], 0.5)
+
+    def test_cart_summary_total_matches_sql_even_with_a_stale_catalog(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('cart_summary'))  # load the catalog snapshot
+        Service.objects.update(small_price='1.00')  # no signal, catalog stays stale
+
+        payload = self.client.get(reverse('cart_summary')).json()
+
+        self.assertEqual(payload['total'], 3.2)
+
+
+class CartSummaryConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('etag', password='pw')
+        self.service = Service.objects.create(name='Lawn', small_price='8.00')
+        CartItem.objects.create(user=self.user, service=self.service)
+        self.client.force_login(self.user)
+
+    def test_matching_etag_answers_304_until_the_cart_changes(self):
+        first = self.client.get(reverse('cart_summary'))
+        etag = first['ETag']
+        self.assertIn('private', first['Cache-Control'])
+
+        cached = self.client.get(reverse('cart_summary'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+        CartItem.objects.filter(user=self.user).update(quantity=3)
+        changed = self.client.get(reverse('cart_summary'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.json()['total'], 24.0)
+
+    def test_etag_follows_service_saves_made_by_other_workers(self):
+        etag = self.client.get(reverse('cart_summary'))['ETag']
+        # A second worker has its own catalog object but the same version.
+        self.assertEqual(ServiceCatalog().version, catalog.version)
+
+        bump_version(caches[CATALOG_CACHE_ALIAS], CATALOG_VERSION_KEY)
+
+        changed = self.client.get(reverse('cart_summary'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class GuestCartMergeTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('guest', password='pw')
+        self.services = [
+            Service.objects.create(name=f"Service {index}", small_price='5.00')
+            for index in range(10)
+        ]
+
+    def _add(self, service, quantity=1):
+        self.client.post(
+            reverse('add_to_cart_guest'),
+            {'service_id': service.pk, 'quantity': quantity},
+        )
+
+    def _login(self):
+        return self.client.post(reverse('login'), {'username': 'guest', 'password': 'pw'})
+
+    def test_login_merges_guest_rows_into_the_user_cart(self):
+        existing = CartItem.objects.create(user=self.user, service=self.services[0], quantity=1)
+        self._add(self.services[0], quantity=2)
+        self._add(self.services[1], quantity=4)
+
+        self._login()
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.quantity, 3)
+        moved = CartItem.objects.get(user=self.user, service=self.services[1])
+        self.assertEqual((moved.quantity, moved.session_id), (4, None))
+        self.assertFalse(CartItem.objects.filter(user__isnull=True).exists())
+
+    def test_merge_query_count_does_not_grow_with_cart_size(self):
+        def queries_for(services):
+            CartItem.objects.all().delete()
+            for service in services[1:]:
+                CartItem.objects.create(user=self.user, service=service)
+            CartItem.objects.bulk_create(
+                CartItem(session_id='guest-session', service=service, quantity=2)
+                for service in services
+            )
+            request = RequestFactory().get('/')
+            request.session = SessionStore()
+            request.session[GUEST_CART_SESSION_KEY] = 'guest-session'
+            with CaptureQueriesContext(connection) as queries:
+                migrate_guest_cart_to_user(request, self.user)
+            self.assertEqual(
+                CartItem.objects.filter(user=self.user, quantity__gte=2).count(),
+                len(services),
+            )
+            return len(queries)
+
+        self.assertEqual(queries_for(self.services[:2]), queries_for(self.services))
+
+
+@override_settings(
+    GUEST_CART_BACKEND='cookie',
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class SignedCookieGuestCartTests(TestCase):
+    def setUp(self):
+        self.service = Service.objects.create(name='Decking', small_price='15.00')
+
+    def _add(self, quantity=2):
+        return self.client.post(
+            reverse('add_to_cart_guest'),
+            {'service_id': self.service.pk, 'quantity': quantity},
+        )
+
+    def test_browsing_a_guest_cart_writes_no_rows(self):
+        self._add()
+        self._add(quantity=1)
+
+        self.assertFalse(CartItem.objects.exists())
+        self.assertFalse(Session.objects.exists())
+        response = self.client.get(reverse('view_cart_guest'))
+        self.assertEqual(response.context['total'], Decimal('45.00'))
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['count'], 1)
+
+    def test_checkout_books_the_cart_and_clears_the_cookie(self):
+        self._add()
+
+        response = self.client.post(reverse('confirm_guest_booking'))
+
+        self.assertEqual(response.context['booking_count'], 1)
+        booking = Booking.objects.get()
+        self.assertEqual((booking.service_id, booking.quantity), (self.service.pk, 2))
+        self.assertEqual(response.cookies['guest_cart'].value, '')
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_replayed_checkout_books_the_cart_once(self):
+        self._add()
+        cart_cookie = self.client.cookies['guest_cart'].value
+
+        self.client.post(reverse('confirm_guest_booking'))
+        # A retried submit (possibly on another worker) still carries the cart.
+        self.client.cookies['guest_cart'] = cart_cookie
+        response = self.client.post(reverse('confirm_guest_booking'))
+
+        self.assertEqual(response.context['booking_count'], 0)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_login_materialises_the_cart_for_the_user(self):
+        user = CustomUser.objects.create_user('guest', password='pw')
+        self._add(quantity=3)
+
+        self.client.post(reverse('login'), {'username': 'guest', 'password': 'pw'})
+
+        item = CartItem.objects.get(user=user)
+        self.assertEqual((item.service_id, item.quantity), (self.service.pk, 3))
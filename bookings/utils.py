@@ -1,23 +1,120 @@
 # bookings/utils.py
+import datetime
+
+from django.db import transaction
+
+from services.models import Service
+
 from .models import CartItem
 
+# Session entry remembering which session key owns the guest's CartItem rows.
+# login() cycles the session key before user_logged_in fires, so the key in
+# force during the merge is no longer the one the rows were saved under.
+GUEST_CART_SESSION_KEY = '_guest_cart_session'
+
+
+def remember_guest_session(request, session_key):
+    if request.session.get(GUEST_CART_SESSION_KEY) != session_key:
+        request.session[GUEST_CART_SESSION_KEY] = session_key
+
+
+def _user_rows(user, service_ids):
+    """Return the user's cart rows for ``service_ids`` keyed by cart line."""
+    rows = {}
+    queryset = (
+        CartItem.objects.select_for_update()
+        .filter(user=user, service_id__in=service_ids)
+        .only('pk', 'service_id', 'size', 'date', 'quantity')
+        .order_by('pk')
+    )
+    for item in queryset:
+        rows.setdefault((item.service_id, item.size, item.date), item)
+    return rows
+
+
+def _merge_store_lines(user, guest_cart):
+    lines = {}
+    for (service_id, size, date), quantity in guest_cart.lines.items():
+        date = datetime.date.fromisoformat(date) if date else None
+        key = (service_id, size, date)
+        lines[key] = lines.get(key, 0) + quantity
+
+    service_ids = {service_id for service_id, _size, _date in lines}
+    live_services = set(
+        Service.objects.filter(pk__in=service_ids).values_list('pk', flat=True)
+    )
+    existing = _user_rows(user, live_services)
+
+    increased, added = [], []
+    for key, quantity in lines.items():
+        service_id, size, date = key
+        if service_id not in live_services:
+            continue
+        if key in existing:
+            existing[key].quantity += quantity
+            increased.append(existing[key])
+        else:
+            added.append(CartItem(
+                user=user,
+                service_id=service_id,
+                size=size,
+                date=date,
+                quantity=quantity,
+            ))
+    CartItem.objects.bulk_update(increased, ['quantity'])
+    CartItem.objects.bulk_create(added)
+
+
+def _merge_session_rows(user, session_key):
+    guest_rows = list(
+        CartItem.objects.select_for_update()
+        .filter(session_id=session_key, user__isnull=True)
+        .only('pk', 'service_id', 'size', 'date', 'quantity')
+        .order_by('pk')
+    )
+    if not guest_rows:
+        return
+    existing = _user_rows(user, {item.service_id for item in guest_rows})
+
+    increased, merged, adopted = {}, [], []
+    for item in guest_rows:
+        key = (item.service_id, item.size, item.date)
+        target = existing.get(key)
+        if target is None:
+            # The first guest row for a line becomes the user's row as is.
+            existing[key] = item
+            adopted.append(item.pk)
+            continue
+        target.quantity += item.quantity
+        increased[target.pk] = target
+        merged.append(item.pk)
+
+    CartItem.objects.bulk_update(increased.values(), ['quantity'])
+    CartItem.objects.filter(pk__in=adopted).update(user=user, session_id=None)
+    CartItem.objects.filter(pk__in=merged).delete()
+
 
 def migrate_guest_cart_to_user(request, user):
-    """Attach any guest cart rows for the current session to the authenticated user."""
-    session_key = request.session.session_key
-    if not session_key:
+    """Merge the guest's cart for the current session into ``user``'s cart.
+
+    Lines already in the user's cart gain the guest quantity; the rest move
+    across. The work is a fixed handful of set-based queries in one
+    transaction, however many lines the guest cart holds.
+    """
+    guest_cart = getattr(request, 'guest_cart', None)
+    if guest_cart is not None:
+        # Stored guest carts only become CartItem rows now, at login.
+        if guest_cart.lines:
+            with transaction.atomic():
+                _merge_store_lines(user, guest_cart)
+            guest_cart.clear()
         return
 
-    guest_items = CartItem.objects.filter(session_id=session_key, user__isnull=True)
-    for item in guest_items:
-        # Try to merge with existing user item (same service, size, date)
-        existing, created = CartItem.objects.get_or_create(
-            user=user,
-            service=item.service,
-            size=item.size,
-            date=item.date,
-            defaults={"quantity": 0}
-        )
-        existing.quantity += item.quantity
-        existing.save()
-        item.delete()
+    session_key = (
+        request.session.pop(GUEST_CART_SESSION_KEY, None)
+        or request.session.session_key
+    )
+    if not session_key:
+        return
+    with transaction.atomic():
+        _merge_session_rows(user, session_key)
@@ -1,12 +1,31 @@
+import hashlib
 from datetime import datetime
 
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    Max,
+    PositiveIntegerField,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Lower
 from django.http import JsonResponse, Http404
 from django.shortcuts import render, redirect
 from django.utils import timezone
-from django.views.decorators.http import require_GET, require_POST
-
-from .models import CartItem, Booking
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.views.decorators.vary import vary_on_cookie
+
+from .guest_cart import get_guest_cart
+from .models import ZERO, CartItem, Booking, GuestCheckout
+from .utils import remember_guest_session
+from core.models import DailyActivityRollup
+from services.catalog import catalog
 from services.models import Service
 import json
 
@@ -15,6 +34,7 @@ def _ensure_session_key(request):
     """Guarantee that the current request has a session key."""
     if not request.session.session_key:
         request.session.save()
+    remember_guest_session(request, request.session.session_key)
     return request.session.session_key
 
 
@@ -51,6 +71,11 @@ def _add_item_to_cart(request, service, size, quantity, date_value=None):
     size = (size or "small").lower()
     parsed_date = _parse_date(date_value)
 
+    guest_cart = get_guest_cart(request)
+    if guest_cart is not None:
+        guest_cart.add(service.pk, size, quantity, parsed_date)
+        return None
+
     lookup = {
         "service": service,
         "size": size,
@@ -70,44 +95,100 @@ def _add_item_to_cart(request, service, size, quantity, date_value=None):
     return cart_item
 
 
-def _finalize_cart_items(cart_items, user=None):
-    """Persist bookings for every cart item and then clear the cart."""
-    bookings_created = []
+def _create_bookings(items, user=None):
+    """Bulk insert one pending booking per cart row (saved or unsaved)."""
     today = timezone.now().date()
-
-    for item in cart_items:
-        booking = Booking.objects.create(
-            user=user,
-            service=item.service,
-            size=item.size,
-            quantity=item.quantity,
-            date=item.date or today,
-            status='pending'
+    bookings_created = Booking.objects.bulk_create(
+        [
+            Booking(
+                user=user,
+                service=item.service,
+                size=item.size,
+                quantity=item.quantity,
+                date=item.date or today,
+                status='pending',
+            )
+            for item in items
+        ]
+    )
+    if bookings_created:
+        # bulk_create skips post_save, so update the daily rollup directly.
+        DailyActivityRollup.bump(
+            DailyActivityRollup.BOOKING,
+            timezone.localdate(bookings_created[0].created_at),
+            delta=len(bookings_created),
         )
-        bookings_created.append(booking)
+    return bookings_created
+
+
+def _finalize_cart_items(cart_items, user=None):
+    """Turn the cart rows into bookings and clear them in one transaction.
+
+    The cart rows are locked first, so a concurrent double-submit waits for
+    this checkout to commit and then finds nothing left to book.
+    """
+    with transaction.atomic():
+        items = list(cart_items.select_for_update(of=('self',)))
+        if not items:
+            return []
+
+        deleted, _ = CartItem.objects.filter(
+            pk__in=[item.pk for item in items],
+        ).delete()
+        if deleted != len(items):
+            # Another checkout claimed some of these rows first; roll back so
+            # the request can retry against the cart as it is now.
+            transaction.set_rollback(True)
+            return []
+
+        return _create_bookings(items, user=user)
+
+
+def _finalize_guest_cart(guest_cart):
+    """Book a stored guest cart once, then empty it.
+
+    A cookie cannot be locked like cart rows, so the bookings are inserted
+    together with a ``GuestCheckout`` row for the cart's fingerprint; a
+    double-submit handled by any worker hits its unique constraint instead
+    of booking the cart twice.
+    """
+    rows = guest_cart.rows()
+    if not rows:
+        return []
 
-    cart_items.delete()
+    try:
+        with transaction.atomic():
+            GuestCheckout.objects.create(fingerprint=guest_cart.fingerprint())
+            bookings_created = _create_bookings(rows, user=None)
+    except IntegrityError:
+        return []
+    guest_cart.clear()
     return bookings_created
 
 
+def _priced_cart(cart_items):
+    """Return ``(rows, total)`` with prices and the cart total computed in SQL."""
+    rows = list(cart_items.with_line_totals())
+    total = rows[0].cart_total if rows else ZERO
+    return rows, total
+
+
 def _serialize_cart(cart_items):
     items = []
-    total = 0
+    total = ZERO
 
     for item in cart_items:
-        service = item.service
-        price = service.get_price(item.size) if service else 0
-        price_value = float(price or 0)
-        subtotal = round(price_value * item.quantity, 2)
+        service = catalog.get(item.service_id)
+        price = getattr(item, "unit_price", None)
+        if price is None:
+            price = (service.prices.get(item.size) if service else None) or ZERO
+        subtotal = price * item.quantity
         total += subtotal
         size_label = (
             item.get_size_display()
             if hasattr(item, "get_size_display")
             else item.size.title()
         )
-        image_url = None
-        if service and getattr(service, "image", None):
-            image_url = service.image.url
 
         items.append(
             {
@@ -115,15 +196,15 @@ def _serialize_cart(cart_items):
                 "service": service.name if service else "Service unavailable",
                 "size": size_label,
                 "quantity": item.quantity,
-                "price": round(price_value, 2),
-                "subtotal": subtotal,
-                "image": image_url,
+                "price": float(price),
+                "subtotal": float(subtotal),
+                "image": service.image_url if service else None,
             }
         )
 
     return {
         "items": items,
-        "total": round(total, 2),
+        "total": float(total),
         "count": len(items),
     }
 
@@ -145,6 +226,88 @@ def _resolve_service(service_id=None, service_name=None):
     raise Http404("Service identifier missing")
 
 
+def _resolve_services(entries):
+    """Resolve every entry's service with one id query and one name query.
+
+    Returns ``(by_id, by_name)`` lookups; ``by_name`` is keyed on the
+    lower-cased name and keeps the lowest id when names collide.
+    """
+    ids = set()
+    names = set()
+    for entry in entries:
+        service_id = entry.get("service_id")
+        service_name = entry.get("service_name") or entry.get("service")
+        if service_id:
+            try:
+                ids.add(int(service_id))
+            except (ValueError, TypeError):
+                continue
+        elif isinstance(service_name, str) and service_name.strip():
+            names.add(service_name.strip().lower())
+
+    by_id = Service.objects.in_bulk(ids) if ids else {}
+    by_name = {}
+    if names:
+        matches = (
+            Service.objects.annotate(name_lower=Lower("name"))
+            .filter(name_lower__in=names)
+            .order_by("pk")
+        )
+        for service in matches:
+            by_name.setdefault(service.name_lower, service)
+    return by_id, by_name
+
+
+def _add_items_to_cart(request, lines):
+    """Merge ``lines`` into the current cart with a bulk upsert.
+
+    ``lines`` maps ``(service, size, date)`` to the quantity to add. Matching
+    rows get a single ``F()``-based increment, the rest are bulk inserted,
+    and the full cart is returned (newest first) without re-querying it.
+    """
+    guest_cart = get_guest_cart(request)
+    if guest_cart is not None:
+        for (service, size, date), quantity in lines.items():
+            guest_cart.add(service.pk, size, quantity, date)
+        return guest_cart.rows()
+
+    cart_items = list(_cart_queryset(request))
+    existing = {}
+    for item in cart_items:
+        existing.setdefault((item.service_id, item.size, item.date), item)
+
+    increments = {}
+    new_items = []
+    if request.user.is_authenticated:
+        owner = {"user": request.user, "session_id": None}
+    else:
+        owner = {"user": None, "session_id": _ensure_session_key(request)}
+
+    for (service, size, date), quantity in lines.items():
+        item = existing.get((service.pk, size, date))
+        if item is not None:
+            increments[item.pk] = quantity
+            item.quantity += quantity
+        else:
+            new_items.append(
+                CartItem(service=service, size=size, date=date, quantity=quantity, **owner)
+            )
+
+    with transaction.atomic():
+        if increments:
+            CartItem.objects.filter(pk__in=increments).update(
+                quantity=F("quantity") + Case(
+                    *(When(pk=pk, then=Value(qty)) for pk, qty in increments.items()),
+                    default=Value(0),
+                    output_field=PositiveIntegerField(),
+                )
+            )
+        if new_items:
+            CartItem.objects.bulk_create(new_items)
+
+    return list(reversed(new_items)) + cart_items
+
+
 # Landing page
 def booking_home(request):
     """Render the bookings landing page."""
@@ -171,18 +334,23 @@ def add_to_cart_guest(request):
 
 
 def view_cart_guest(request):
-    session_key = request.session.session_key
-    if not session_key:
-        cart_items = CartItem.objects.none()
+    guest_cart = get_guest_cart(request)
+    if guest_cart is not None:
+        cart_items = guest_cart.rows()
+        total = guest_cart.total(cart_items)
     else:
-        cart_items = (
-            CartItem.objects.filter(
-                session_id=session_key,
-                user__isnull=True,
+        session_key = request.session.session_key
+        if not session_key:
+            cart_items = CartItem.objects.none()
+        else:
+            cart_items = (
+                CartItem.objects.filter(
+                    session_id=session_key,
+                    user__isnull=True,
+                )
+                .select_related('service')
             )
-            .select_related('service')
-        )
-    total = sum(item.total_price() for item in cart_items)
+        cart_items, total = _priced_cart(cart_items)
     return render(
         request,
         'booking/guest_cart.html',
@@ -197,29 +365,21 @@ def confirm_guest_booking(request):
     if request.method != 'POST':
         return redirect('view_cart_guest')
 
+    guest_cart = get_guest_cart(request)
     session_key = request.session.session_key
-    if not session_key:
+    if guest_cart is not None:
+        bookings_created = _finalize_guest_cart(guest_cart)
+    elif not session_key:
         return redirect('view_cart_guest')
-
-    cart_items = (
-        CartItem.objects.filter(
-            session_id=session_key,
-            user__isnull=True,
-        )
-        .select_related('service')
-    )
-    if not cart_items.exists():
-        return render(
-            request,
-            'booking/booking_confirmation.html',
-            {
-                'bookings': [],
-                'booking_count': 0,
-                'is_guest': True,
-            },
+    else:
+        cart_items = (
+            CartItem.objects.filter(
+                session_id=session_key,
+                user__isnull=True,
+            )
+            .select_related('service')
         )
-
-    bookings_created = _finalize_cart_items(cart_items, user=None)
+        bookings_created = _finalize_cart_items(cart_items, user=None)
     return render(
         request,
         'booking/booking_confirmation.html',
@@ -254,21 +414,13 @@ def add_to_cart(request):
 
 @login_required
 def view_cart(request):
-    cart_items = _cart_queryset(request)
-    total = sum(item.total_price() for item in cart_items)
+    cart_items, total = _priced_cart(_cart_queryset(request))
     return render(request, 'booking/cart.html', {'cart': cart_items, 'total': total})
 
 
 @login_required
 def confirm_cart(request):
     cart_items = _cart_queryset(request)
-    if not cart_items.exists():
-        return render(request, 'booking/booking_confirmation.html', {
-            'bookings': [],
-            'booking_count': 0,
-            'is_guest': False,
-        })
-
     bookings_created = _finalize_cart_items(cart_items, user=request.user)
     return render(request, 'booking/booking_confirmation.html', {
         'bookings': bookings_created,
@@ -291,10 +443,12 @@ def add_to_cart_ajax(request):
         has_service = payload.get("service_id") or payload.get("service_name")
         raw_items = [payload] if has_service else []
 
+    entries = [entry for entry in raw_items if isinstance(entry, dict)]
+    by_id, by_name = _resolve_services(entries)
+
     added = 0
-    for entry in raw_items:
-        if not isinstance(entry, dict):
-            continue
+    lines = {}
+    for entry in entries:
         quantity = entry.get("quantity", 0)
         try:
             quantity = int(quantity)
@@ -306,22 +460,27 @@ def add_to_cart_ajax(request):
 
         service_id = entry.get("service_id")
         service_name = entry.get("service_name") or entry.get("service")
-        size = entry.get("size", "small")
-        date = entry.get("date")
-
-        try:
-            service = _resolve_service(service_id, service_name)
-        except Http404:
+        if service_id:
+            try:
+                service = by_id.get(int(service_id))
+            except (ValueError, TypeError):
+                service = None
+        elif isinstance(service_name, str):
+            service = by_name.get(service_name.strip().lower())
+        else:
+            service = None
+        if service is None:
             continue
 
-        created_item = _add_item_to_cart(request, service, size, quantity, date)
-        if created_item:
-            added += 1
+        size = (entry.get("size") or "small").lower()
+        key = (service, size, _parse_date(entry.get("date")))
+        lines[key] = lines.get(key, 0) + quantity
+        added += 1
 
     if not added:
         return JsonResponse({"error": "No valid cart items supplied."}, status=400)
 
-    summary = _serialize_cart(_cart_queryset(request))
+    summary = _serialize_cart(_add_items_to_cart(request, lines))
     return JsonResponse({
         "success": True,
         "added": added,
@@ -329,8 +488,52 @@ def add_to_cart_ajax(request):
     })
 
 
+def _cart_etag(request):
+    """Fingerprint the current cart without serialising it.
+
+    ``catalog.version`` is read from the shared cache, so every worker
+    computes the same ETag for a cart, and a service saved in any worker
+    changes it everywhere.
+    """
+    guest_cart = get_guest_cart(request)
+    if guest_cart is not None:
+        return f"{guest_cart.fingerprint()}-{catalog.version}"
+
+    stats = (
+        _cart_queryset(request)
+        .select_related(None)
+        .order_by()
+        .aggregate(
+            count=Count("pk"),
+            last_id=Max("pk"),
+            latest=Max("added_at"),
+            quantity=Sum("quantity"),
+        )
+    )
+    if request.user.is_authenticated:
+        owner = f"user:{request.user.pk}"
+    else:
+        owner = f"session:{request.session.session_key or ''}"
+    latest = stats["latest"].isoformat() if stats["latest"] else ""
+    fingerprint = (
+        f"{owner}|{stats['count']}|{stats['last_id']}|{latest}|"
+        f"{stats['quantity']}|{catalog.version}"
+    )
+    return hashlib.md5(fingerprint.encode()).hexdigest()
+
+
 @require_GET
+@vary_on_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_cart_etag)
 def cart_summary(request):
     """Return a lightweight JSON summary of the current cart."""
-    summary = _serialize_cart(_cart_queryset(request))
-    return JsonResponse(summary)
+    guest_cart = get_guest_cart(request)
+    if guest_cart is not None:
+        return JsonResponse(_serialize_cart(guest_cart.rows()))
+
+    # Prices and the total come from SQL, exactly as on the cart page; the
+    # one query joins services_service only for the per-size price columns.
+    # Names and images come from the catalog.
+    cart_items, _total = _priced_cart(_cart_queryset(request).select_related(None))
+    return JsonResponse(_serialize_cart(cart_items))
@@ -3,17 +3,20 @@
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin import AdminSite
-from django.core.mail import send_mail
+from django.db import transaction
 from django.http import HttpResponseNotAllowed
 from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import path, reverse
 from django.utils.html import format_html, format_html_join
-from django.utils.timezone import now, timedelta
 
 from blog.models import Comment, Post
 from bookings.models import Booking
-from users.models import BloggerRequest, CustomUser, UserNotification
+from core.outbox import queue_email
+from users.models import BloggerRequest
+from users.notifications import notify
+
+from .dashboard import get_dashboard_metrics, invalidate_dashboard_metrics
 
 
 class CustomAdminSite(AdminSite):
@@ -36,66 +39,70 @@ class CustomAdminSite(AdminSite):
         if request.method != 'POST':
             return HttpResponseNotAllowed(['POST'])
 
-        post = get_object_or_404(Post, pk=post_id)
-        post.status = 'published'
-        post.save(update_fields=['status', 'updated_on'])
+        with transaction.atomic():
+            post = get_object_or_404(Post, pk=post_id)
+            post.status = 'published'
+            post.save(update_fields=['status', 'updated_on'])
 
-        author = post.author
-        if author:
-            if not author.is_blogger:
-                author.become_blogger()
+            author = post.author
+            if author:
+                if not author.is_blogger:
+                    author.become_blogger()
 
-            related_requests = BloggerRequest.objects.filter(user=author, post=post)
-            for request_obj in related_requests:
-                if not request_obj.approved:
-                    request_obj.approved = True
-                    request_obj.save(update_fields=['approved'])
+                related_requests = BloggerRequest.objects.filter(user=author, post=post)
+                for request_obj in related_requests:
+                    if not request_obj.approved:
+                        request_obj.approved = True
+                        request_obj.save(update_fields=['approved'])
 
-            notification_message = (
-                f"Your blog '{post.title}' has been approved and published."
-            )
-            UserNotification.objects.create(
-                user=author,
-                message=notification_message,
-            )
+                notification_message = (
+                    f"Your blog '{post.title}' has been approved and published."
+                )
+                notify(author, notification_message)
 
-            if author.email:
-                try:
-                    send_mail(
+                if author.email:
+                    # Queued with the approval; send_outbox delivers it later,
+                    # so a slow or failing relay cannot block the workflow.
+                    queue_email(
                         subject="Your blog post is live",
-                        message=(
+                        body=(
                             f"Hi {author.username},\n\n"
                             f"Great news! Your blog '{post.title}' has been "
                             "approved and is now visible on the site."
                         ),
+                        recipients=[author.email],
                         from_email=getattr(
                             settings,
                             'DEFAULT_FROM_EMAIL',
                             'noreply@example.com',
                         ),
-                        recipient_list=[author.email],
-                        fail_silently=True,
                     )
-                except Exception:
-                    # Email failures should not block the approval workflow.
-                    pass
 
+        invalidate_dashboard_metrics()
         messages.success(
             request,
             f"Post '{post.title}' is now published and the author has been notified.",
         )
         return redirect('admin:index')
 
-    def each_context(self, request):
-        context = super().each_context(request)
+    def index(self, request, extra_context=None):
+        # Dashboard widgets only render on the index, so keep their queries
+        # out of each_context (which runs for every admin page).
+        context = self._dashboard_context(request)
+        context.update(extra_context or {})
+        return super().index(request, extra_context=context)
+
+    def _dashboard_context(self, request):
+        context = {}
+        metrics = get_dashboard_metrics()
 
         # --- Dashboard cards ---
-        pending_bloggers = BloggerRequest.objects.filter(approved=False).count()
-        unapproved_comments = Comment.objects.filter(approved=False).count()
-        total_users = CustomUser.objects.count()
-        pending_bookings = Booking.objects.filter(status='pending').count()
-        pending_blog_posts = Post.objects.filter(status='draft')
-        pending_blog_count = pending_blog_posts.count()
+        cards = metrics['cards']
+        pending_bloggers = cards['pending_bloggers']
+        unapproved_comments = cards['unapproved_comments']
+        total_users = cards['total_users']
+        pending_bookings = cards['pending_bookings']
+        pending_blog_count = cards['pending_blog_posts']
 
         blogger_request_url = (
             f"{reverse('admin:users_bloggerrequest_changelist')}?approved__exact=0"
@@ -217,10 +224,17 @@ class CustomAdminSite(AdminSite):
             BloggerRequest.objects.select_related('user', 'post')
             .order_by('-created_at')[:5]
         )
-        recent_comments = Comment.objects.order_by('-created_at')[:5]
-        recent_bookings = Booking.objects.order_by('-created_at')[:5]
+        recent_comments = (
+            Comment.objects.select_related('author')
+            .order_by('-created_at')[:5]
+        )
+        recent_bookings = (
+            Booking.objects.select_related('user', 'service')
+            .order_by('-created_at')[:5]
+        )
         pending_post_list = (
-            pending_blog_posts.select_related('author')
+            Post.objects.filter(status='draft')
+            .select_related('author')
             .order_by('-created_on')[:5]
         )
         csrf_token = get_token(request)
@@ -392,24 +406,6 @@ class CustomAdminSite(AdminSite):
         )
 
         # --- Charts data ---
-        today = now().date()
-        dates = [today - timedelta(days=delta) for delta in range(6, -1, -1)]
-        labels = [day.strftime('%b %d') for day in dates]
-
-        context['charts_data'] = {
-            'labels': labels,
-            'bookings': [
-                Booking.objects.filter(created_at__date=day).count()
-                for day in dates
-            ],
-            'blogger_requests': [
-                BloggerRequest.objects.filter(created_at__date=day).count()
-                for day in dates
-            ],
-            'comments': [
-                Comment.objects.filter(created_at__date=day).count()
-                for day in dates
-            ],
-        }
+        context['charts_data'] = metrics['charts']
 
         return context
@@ -0,0 +1,65 @@
+# config/dashboard.py
+"""Aggregated metrics for the custom admin index dashboard."""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from blog.models import Comment, Post
+from bookings.models import Booking
+from core.cache import NamespacedCache
+from core.models import DailyActivityRollup
+from users.models import BloggerRequest, CustomUser
+
+DASHBOARD_CACHE_KEY = 'metrics'
+DASHBOARD_CACHE_TTL = 30  # seconds
+CHART_DAYS = 7
+
+dashboard_cache = NamespacedCache('admin-dashboard', timeout=DASHBOARD_CACHE_TTL)
+
+
+def _daily_series(dates):
+    """Read every chart series for ``dates`` from the daily rollup table."""
+    totals = {
+        (row.kind, row.day): row.count
+        for row in DailyActivityRollup.objects.filter(
+            day__gte=dates[0],
+            day__lte=dates[-1],
+        )
+    }
+    return {
+        kind: [totals.get((kind, day), 0) for day in dates]
+        for kind, _label in DailyActivityRollup.KIND_CHOICES
+    }
+
+
+def compute_dashboard_metrics():
+    """Run the card counts and chart series without any caching."""
+    today = timezone.localdate()
+    dates = [today - timedelta(days=delta) for delta in range(CHART_DAYS - 1, -1, -1)]
+    series = _daily_series(dates)
+
+    return {
+        'cards': {
+            'total_users': CustomUser.objects.count(),
+            'pending_bloggers': BloggerRequest.objects.filter(approved=False).count(),
+            'unapproved_comments': Comment.objects.filter(approved=False).count(),
+            'pending_bookings': Booking.objects.filter(status='pending').count(),
+            'pending_blog_posts': Post.objects.filter(status='draft').count(),
+        },
+        'charts': {
+            'labels': [day.strftime('%b %d') for day in dates],
+            'bookings': series[DailyActivityRollup.BOOKING],
+            'blogger_requests': series[DailyActivityRollup.BLOGGER_REQUEST],
+            'comments': series[DailyActivityRollup.COMMENT],
+        },
+    }
+
+
+def get_dashboard_metrics():
+    """Return dashboard metrics, memoized for ``DASHBOARD_CACHE_TTL`` seconds."""
+    return dashboard_cache.get_or_set(DASHBOARD_CACHE_KEY, compute_dashboard_metrics)
+
+
+def invalidate_dashboard_metrics():
+    """Drop the memoized metrics so the next index view recomputes them."""
+    dashboard_cache.invalidate()
@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import importlib.util
 import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -136,6 +139,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'bookings.middleware.GuestCartMiddleware',
     'core.middleware.CustomErrorPageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -221,6 +225,108 @@ if _db_url or use_postgres_flag:
             }
 
 
+# Caches: 'default' backs memoized values (dashboard metrics, guest carts,
+# core.cache namespaces); 'pages' holds full anonymous page responses;
+# 'shared' holds small values every worker must agree on (version counters
+# such as the service catalog's).
+# CACHE_BACKEND / PAGE_CACHE_BACKEND pick 'locmem' (per process), 'file'
+# (shared by workers on one host) or 'redis' (shared by every host; any
+# Redis-compatible server at CACHE_URL, e.g. a local redis or valkey).
+# 'default' falls back to locmem. 'pages' and 'shared' fall back to
+# CACHE_BACKEND and then to 'file': they are invalidated from signals in
+# whichever worker saved the model, so a per-process cache would leave every
+# other gunicorn worker serving stale data. Use redis once there is more than
+# one host. `manage.py test` always uses locmem, so test runs leave nothing
+# on disk.
+_CACHE_URL = os.environ.get('CACHE_URL', 'redis://127.0.0.1:6379/1')
+TESTING = sys.argv[1:2] == ['test']
+
+
+def _cache_config(backend, name, max_entries):
+    backend = (backend or 'locmem').lower()
+    if backend not in ('locmem', 'file', 'redis'):
+        raise ImproperlyConfigured(
+            f"Unknown cache backend {backend!r} for {name!r}; "
+            "use 'locmem', 'file' or 'redis'."
+        )
+    if backend == 'redis' and importlib.util.find_spec('redis') is None:
+        raise ImproperlyConfigured(
+            "The 'redis' cache backend needs the redis package "
+            "(pip install -r requirements.txt)."
+        )
+    if backend == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.cache' / name,
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        }
+    if backend == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _CACHE_URL,
+            'KEY_PREFIX': f'capstone:{name}',
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'capstone-{name}',
+        'OPTIONS': {'MAX_ENTRIES': max_entries},
+    }
+
+
+if TESTING:
+    _DEFAULT_CACHE_BACKEND = _SHARED_CACHE_BACKEND = _PAGE_CACHE_BACKEND = 'locmem'
+else:
+    _DEFAULT_CACHE_BACKEND = os.environ.get('CACHE_BACKEND')
+    _SHARED_CACHE_BACKEND = _DEFAULT_CACHE_BACKEND or 'file'
+    _PAGE_CACHE_BACKEND = (
+        os.environ.get('PAGE_CACHE_BACKEND') or _SHARED_CACHE_BACKEND
+    )
+
+CACHES = {
+    'default': _cache_config(_DEFAULT_CACHE_BACKEND, 'default', 1000),
+    'shared': _cache_config(_SHARED_CACHE_BACKEND, 'shared', 1000),
+    'pages': _cache_config(_PAGE_CACHE_BACKEND, 'pages', 5000),
+}
+
+PAGE_CACHE_ENABLED = (
+    os.environ.get('PAGE_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+)
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 300))
+
+
+# Sessions: 'db' (Django's default) reads the session table on every
+# request; 'cached_db' serves reads from the default cache and only writes
+# through to the table; 'signed_cookies' keeps no server-side state at all.
+# Run `manage.py purge_sessions` periodically for the database-backed ones.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'db').lower()
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}; "
+        f"use one of {', '.join(map(repr, SESSION_ENGINES))}."
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
+
+# Guest carts: 'db' stores CartItem rows per session (default), 'cookie'
+# keeps them in a signed cookie and 'cache' in the default cache. The last
+# two only write CartItem/Booking rows at checkout or login. Signed-cookie
+# sessions have no stable key to file CartItem rows under, so they default
+# to the cookie store.
+GUEST_CART_BACKEND = os.environ.get(
+    'GUEST_CART_BACKEND',
+    'cookie' if SESSION_BACKEND == 'signed_cookies' else 'db',
+)
+
+# Background jobs (core.jobs): finished and failed Job rows are kept this
+# many days for run_worker --stats, then pruned by the core.prune_jobs job.
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import include, path
 
+from blog.admin import PostAdmin
 from blog.models import Comment, Post
 from bookings.models import Booking
 from config.admin_site import CustomAdminSite
@@ -18,7 +19,7 @@ custom_admin.register(CustomUser)
 custom_admin.register(CustomerProfile)
 custom_admin.register(BloggerProfile)
 custom_admin.register(BloggerRequest)
-custom_admin.register(Post)
+custom_admin.register(Post, PostAdmin)
 custom_admin.register(Comment)
 custom_admin.register(Booking)
 
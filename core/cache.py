@@ -0,0 +1,162 @@
+"""Namespaced, versioned cache helpers shared by views, fragments and the admin.
+
+Every ``NamespacedCache`` keys its entries as ``<namespace>:v<version>:<key>``.
+``invalidate()`` bumps the version, orphaning every entry of the namespace at
+once without knowing their keys. ``get_or_set()`` adds stampede protection:
+values are stored with a soft expiry, and once that passes a single caller
+(holding a short ``cache.add`` lock) recomputes while the rest keep serving
+the stale value. Hits, misses and stale serves are counted in the cache
+itself so the numbers are shared by every process using the same backend.
+"""
+import time
+
+from django.core.cache import caches
+
+DEFAULT_TIMEOUT = 300  # seconds a value counts as fresh
+DEFAULT_STALE_TIMEOUT = 60  # extra seconds a stale value may still be served
+LOCK_TIMEOUT = 30  # seconds before an abandoned recompute lock expires
+LOCK_WAIT = 0.05  # seconds between polls while another caller fills a miss
+LOCK_POLLS = 20
+
+STAT_NAMES = ('hits', 'misses', 'stale')
+
+_MISSING = object()
+
+
+def get_version(cache, key):
+    """Return the integer version stored at ``key`` (``1`` when unset)."""
+    return cache.get(key) or 1
+
+
+def get_versions(cache, keys):
+    """Return ``{key: version}`` for ``keys`` using a single cache round trip."""
+    found = cache.get_many(keys)
+    return {key: found.get(key) or 1 for key in keys}
+
+
+def bump_version(cache, key):
+    """Increment the version stored at ``key``; it never expires."""
+    if cache.add(key, 2, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The key was evicted between add() and incr().
+        cache.set(key, 2, None)
+
+
+def _increment(cache, key):
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+class NamespacedCache:
+    """A versioned key namespace on one of the configured ``CACHES`` aliases."""
+
+    def __init__(
+        self,
+        namespace,
+        alias='default',
+        timeout=DEFAULT_TIMEOUT,
+        stale_timeout=DEFAULT_STALE_TIMEOUT,
+    ):
+        self.namespace = namespace
+        self.alias = alias
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_key(self):
+        return f'{self.namespace}:version'
+
+    def _stat_key(self, name):
+        return f'{self.namespace}:stats:{name}'
+
+    def key(self, key):
+        """Return the fully qualified cache key for ``key``."""
+        version = get_version(self.cache, self.version_key)
+        return f'{self.namespace}:v{version}:{key}'
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key`` (even if stale) or ``default``."""
+        envelope = self.cache.get(self.key(key))
+        if envelope is None:
+            return default
+        return envelope[1]
+
+    def set(self, key, value, timeout=None):
+        """Store ``value`` as fresh for ``timeout`` (default: the namespace's)."""
+        self._store(self.key(key), value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.key(key))
+
+    def invalidate(self):
+        """Expire every entry in the namespace by bumping its version."""
+        bump_version(self.cache, self.version_key)
+
+    def _store(self, full_key, value, timeout):
+        fresh_for = self.timeout if timeout is None else timeout
+        envelope = (time.time() + fresh_for, value)
+        self.cache.set(full_key, envelope, fresh_for + self.stale_timeout)
+
+    def _record(self, name):
+        _increment(self.cache, self._stat_key(name))
+
+    def get_or_set(self, key, producer, timeout=None):
+        """Return the cached value for ``key``, calling ``producer()`` to fill it.
+
+        Only one caller recomputes an expired value; concurrent callers get
+        the stale copy instead of piling onto the database. On a cold miss the
+        others wait briefly for the lock holder before computing themselves.
+        """
+        full_key = self.key(key)
+        lock_key = f'{full_key}:lock'
+        envelope = self.cache.get(full_key)
+
+        if envelope is not None:
+            fresh_until, value = envelope
+            if fresh_until > time.time():
+                self._record('hits')
+                return value
+            if not self.cache.add(lock_key, 1, LOCK_TIMEOUT):
+                self._record('stale')
+                return value
+        elif not self.cache.add(lock_key, 1, LOCK_TIMEOUT):
+            value = self._wait_for(full_key)
+            if value is not _MISSING:
+                self._record('hits')
+                return value
+
+        self._record('misses')
+        try:
+            value = producer()
+            self._store(full_key, value, timeout)
+        finally:
+            self.cache.delete(lock_key)
+        return value
+
+    def _wait_for(self, full_key):
+        for _ in range(LOCK_POLLS):
+            time.sleep(LOCK_WAIT)
+            envelope = self.cache.get(full_key)
+            if envelope is not None:
+                return envelope[1]
+        return _MISSING
+
+    def stats(self):
+        """Return ``{'hits': n, 'misses': n, 'stale': n}`` for the namespace."""
+        keys = {name: self._stat_key(name) for name in STAT_NAMES}
+        found = self.cache.get_many(keys.values())
+        return {name: found.get(key, 0) for name, key in keys.items()}
+
+    def reset_stats(self):
+        self.cache.delete_many([self._stat_key(name) for name in STAT_NAMES])
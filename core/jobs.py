@@ -0,0 +1,304 @@
+"""A small database-backed job queue.
+
+Register work with ``register_job`` in an app's ``tasks.py`` module, queue it
+with ``enqueue`` and run ``manage.py run_worker`` to execute it::
+
+    @register_job('blog.reindex_post')
+    def reindex_post(post_id):
+        ...
+
+    enqueue('blog.reindex_post', {'post_id': post.pk})
+
+Jobs registered with ``every=`` recur: the worker keeps exactly one queued
+copy of each and schedules the next run when the current one finishes.
+
+Workers claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it (PostgreSQL). Elsewhere (SQLite) a job is claimed by a
+conditional ``UPDATE`` that only one worker can win. While a job runs, its
+worker refreshes ``locked_at`` every ``HEARTBEAT_INTERVAL``; a ``running``
+job whose lock is older than ``LOCK_TIMEOUT`` belongs to a crashed worker
+and is claimed again, so it runs a second time. Jobs must therefore be safe
+to re-run.
+
+Finished and failed rows are kept for ``settings.JOB_RETENTION_DAYS`` and
+then deleted by ``prune_jobs``.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = timedelta(minutes=15)
+HEARTBEAT_INTERVAL = LOCK_TIMEOUT / 3
+PRUNE_BATCH_SIZE = 1000
+RETRY_BASE_DELAY = 30  # seconds; doubles after every failed attempt
+RETRY_MAX_DELAY = 60 * 60
+
+JobSpec = namedtuple('JobSpec', ['name', 'func', 'every', 'max_attempts'])
+
+_registry = {}
+
+
+def register_job(name=None, every=None, max_attempts=3):
+    """Register the decorated function as a job called ``name``.
+
+    ``every`` (a ``timedelta``) makes the job recurring.
+    """
+
+    def decorator(func):
+        job_name = name or f'{func.__module__}.{func.__name__}'
+        _registry[job_name] = JobSpec(job_name, func, every, max_attempts)
+        return func
+
+    return decorator
+
+
+def get_job(name):
+    return _registry.get(name)
+
+
+def registered_jobs():
+    return dict(_registry)
+
+
+def autodiscover():
+    """Import every installed app's ``tasks`` module so its jobs register."""
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, payload=None, run_at=None, delay=None, unique_key=None):
+    """Queue ``name`` to run with ``payload`` as keyword arguments.
+
+    Returns the new ``Job``, or ``None`` when ``unique_key`` is already held
+    by a queued or running job.
+    """
+    spec = get_job(name)
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                name=name,
+                payload=payload or {},
+                run_at=run_at,
+                unique_key=unique_key,
+                max_attempts=spec.max_attempts if spec else 3,
+            )
+    except IntegrityError:
+        if unique_key is None:
+            raise
+        return None
+
+
+def _recurring_key(name):
+    return f'recurring:{name}'
+
+
+def schedule_recurring_jobs():
+    """Make sure every recurring job has a queued or running copy."""
+    for spec in _registry.values():
+        if spec.every is not None:
+            enqueue(spec.name, unique_key=_recurring_key(spec.name))
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying after ``attempts`` failures."""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def _claimable(now):
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT)
+    ).order_by('run_at', 'id')
+
+
+def claim_job(worker_id):
+    """Claim the next due job for ``worker_id`` and return it (or ``None``)."""
+    now = timezone.now()
+    claimed = {
+        'status': Job.RUNNING,
+        'locked_by': worker_id,
+        'locked_at': now,
+        'started_at': now,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = _claimable(now).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claimed)
+    else:
+        # No row locks: whichever worker flips the row first wins it, and
+        # the others move on to the next candidate.
+        while True:
+            job = _claimable(now).only('pk', 'status', 'locked_at').first()
+            if job is None:
+                return None
+            won = Job.objects.filter(
+                pk=job.pk,
+                status=job.status,
+                locked_at=job.locked_at,
+            ).update(**claimed)
+            if won:
+                break
+
+    job.refresh_from_db()
+    return job
+
+
+def touch_job(job):
+    """Refresh the lock on ``job`` while its worker still holds it."""
+    return Job.objects.filter(
+        pk=job.pk,
+        status=Job.RUNNING,
+        locked_by=job.locked_by,
+    ).update(locked_at=timezone.now())
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, job):
+        super().__init__(name=f'job-heartbeat-{job.pk}', daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(HEARTBEAT_INTERVAL.total_seconds()):
+                touch_job(self.job)
+        finally:
+            # The heartbeat opened its own database connection.
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """Execute a claimed ``job`` and record its outcome and timing."""
+    spec = get_job(job.name)
+    heartbeat = _Heartbeat(job)
+    heartbeat.start()
+    started = time.monotonic()
+    error = None
+    try:
+        if spec is None:
+            raise LookupError(f"No job registered as {job.name!r}.")
+        spec.func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Job %s #%s failed", job.name, job.pk)
+    finally:
+        heartbeat.stop()
+
+    finished_at = timezone.now()
+    job.finished_at = finished_at
+    job.duration_ms = int((time.monotonic() - started) * 1000)
+    job.attempts += 1
+    job.locked_by = ''
+    job.locked_at = None
+
+    if error is None:
+        job.status = Job.DONE
+        job.last_error = ''
+    else:
+        job.last_error = error[-4000:]
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = finished_at + timedelta(seconds=retry_delay(job.attempts))
+        else:
+            job.status = Job.FAILED
+    job.save(update_fields=[
+        'status', 'attempts', 'run_at', 'locked_by', 'locked_at',
+        'finished_at', 'duration_ms', 'last_error',
+    ])
+
+    if spec is not None and spec.every is not None and job.status != Job.QUEUED:
+        enqueue(
+            spec.name,
+            run_at=finished_at + spec.every,
+            unique_key=_recurring_key(spec.name),
+        )
+    return job
+
+
+def prune_jobs(older_than=None, batch_size=PRUNE_BATCH_SIZE):
+    """Delete finished and failed jobs older than ``older_than``.
+
+    ``older_than`` defaults to ``settings.JOB_RETENTION_DAYS``. Rows go in
+    batches so the table is never locked for long. Returns the number
+    deleted.
+    """
+    if older_than is None:
+        older_than = timedelta(days=getattr(settings, 'JOB_RETENTION_DAYS', 7))
+    cutoff = timezone.now() - older_than
+    expired = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED],
+        finished_at__lt=cutoff,
+    )
+    deleted = 0
+    while True:
+        pks = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        count, _ = Job.objects.filter(pk__in=pks).delete()
+        deleted += count
+
+
+def job_stats(since=None):
+    """Return per-name run counts and timings for finished jobs."""
+    jobs = Job.objects.filter(status__in=[Job.DONE, Job.FAILED])
+    if since is not None:
+        jobs = jobs.filter(finished_at__gte=since)
+    return list(
+        jobs.values('name')
+        .annotate(
+            runs=Count('pk'),
+            failures=Count('pk', filter=Q(status=Job.FAILED)),
+            avg_ms=Avg('duration_ms'),
+            max_ms=Max('duration_ms'),
+        )
+        .order_by('name')
+    )
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def work(worker_id=None, once=False, interval=1.0, stop_event=None):
+    """Claim and run jobs until stopped; returns the number of jobs run.
+
+    With ``once`` the loop returns as soon as no job is due.
+    """
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while stop_event is None or not stop_event.is_set():
+        job = claim_job(worker_id)
+        if job is None:
+            if once:
+                break
+            if stop_event is not None:
+                stop_event.wait(interval)
+            else:
+                time.sleep(interval)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,113 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.guest_cart import GUEST_CART_MAX_AGE
+from bookings.models import CartItem, GuestCheckout
+
+DATABASE_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions and the guest CartItem rows filed under them, "
+        "in small batches so neither table is locked for long, plus guest "
+        "cart rows whose session is already gone and guest checkout markers "
+        "older than any guest cart cookie."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Sessions deleted per transaction (default: 500).",
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help="Seconds to pause between batches (default: 0).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        pause = options['sleep']
+        now = timezone.now()
+        sessions_deleted = cart_items_deleted = 0
+
+        while True:
+            with transaction.atomic():
+                keys = list(
+                    Session.objects.filter(expire_date__lt=now)
+                    .order_by('expire_date')
+                    .values_list('session_key', flat=True)[:batch_size]
+                )
+                if not keys:
+                    break
+                cart_deleted, _ = CartItem.objects.filter(
+                    user__isnull=True,
+                    session_id__in=keys,
+                ).delete()
+                deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+
+            sessions_deleted += deleted
+            cart_items_deleted += cart_deleted
+            if len(keys) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        cart_items_deleted += self._purge_orphaned_cart_items(now, batch_size, pause)
+
+        # A marker only has to outlive the cart cookie it protects.
+        checkouts_deleted, _ = GuestCheckout.objects.filter(
+            created_at__lt=now - timedelta(seconds=GUEST_CART_MAX_AGE),
+        ).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {sessions_deleted} expired sessions, "
+                f"{cart_items_deleted} guest cart items and "
+                f"{checkouts_deleted} guest checkout markers."
+            )
+        )
+
+    def _orphaned_cart_items(self, now):
+        """Guest rows whose session no longer exists (e.g. after clearsessions)."""
+        guest_items = CartItem.objects.filter(
+            user__isnull=True,
+            session_id__isnull=False,
+            added_at__lt=now,
+        )
+        if settings.SESSION_ENGINE in DATABASE_SESSION_ENGINES:
+            return guest_items.exclude(
+                session_id__in=Session.objects.values('session_key'),
+            )
+        # Without a session table, rows outlive their session once they are
+        # older than any session cookie could be.
+        return guest_items.filter(
+            added_at__lt=now - timedelta(seconds=settings.SESSION_COOKIE_AGE),
+        )
+
+    def _purge_orphaned_cart_items(self, now, batch_size, pause):
+        orphaned = self._orphaned_cart_items(now)
+        deleted = 0
+        while True:
+            pks = list(orphaned.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            count, _ = CartItem.objects.filter(pk__in=pks).delete()
+            deleted += count
+            if len(pks) < batch_size:
+                return deleted
+            if pause:
+                time.sleep(pause)
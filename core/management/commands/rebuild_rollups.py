@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from core.models import DailyActivityRollup
+from core.signals import ROLLUP_KINDS
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyActivityRollup rows from bookings, comments and blogger requests."
+
+    def handle(self, *args, **options):
+        rollups = []
+        for model, kind in ROLLUP_KINDS.items():
+            rows = (
+                model.objects.filter(created_at__isnull=False)
+                .annotate(day=TruncDate('created_at'))
+                .values('day')
+                .annotate(total=Count('pk'))
+                .order_by()
+            )
+            rollups.extend(
+                DailyActivityRollup(day=row['day'], kind=kind, count=row['total'])
+                for row in rows
+            )
+
+        with transaction.atomic():
+            DailyActivityRollup.objects.all().delete()
+            DailyActivityRollup.objects.bulk_create(rollups, batch_size=500)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {len(rollups)} daily rollup rows.")
+        )
@@ -0,0 +1,93 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the Job table (see core.jobs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help="Worker threads claiming jobs in parallel (default: 1).",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Exit once no job is due instead of polling.",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help="Seconds to wait when no job is due (default: 1).",
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help="Print run counts and timings per job name, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        jobs.autodiscover()
+
+        if options['stats']:
+            self._print_stats()
+            return
+
+        jobs.schedule_recurring_jobs()
+        concurrency = max(options['concurrency'], 1)
+        stop_event = threading.Event()
+        work_options = {
+            'once': options['once'],
+            'interval': options['interval'],
+            'stop_event': stop_event,
+        }
+        processed = []
+
+        if concurrency == 1:
+            try:
+                processed.append(jobs.work(**work_options))
+            except KeyboardInterrupt:
+                pass
+        else:
+            def run():
+                try:
+                    processed.append(jobs.work(**work_options))
+                finally:
+                    # Each thread opened its own database connection.
+                    connection.close()
+
+            threads = [
+                threading.Thread(target=run, name=f'job-worker-{index}', daemon=True)
+                for index in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(timeout=0.5)
+            except KeyboardInterrupt:
+                # Let every thread finish its current job before exiting.
+                stop_event.set()
+                for thread in threads:
+                    thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {sum(processed)} jobs."))
+
+    def _print_stats(self):
+        rows = jobs.job_stats()
+        if not rows:
+            self.stdout.write("No finished jobs yet.")
+            return
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']}: {row['runs']} runs, {row['failures']} failed, "
+                f"avg {row['avg_ms'] or 0:.0f} ms, max {row['max_ms'] or 0} ms"
+            )
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import send_due_emails
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the EmailOutbox table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help="Emails sent per SMTP connection (default: 50).",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep running and poll for new emails (worker mode).",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help="Seconds between polls when the outbox is empty (default: 5).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        total_sent = total_failed = 0
+
+        while True:
+            sent, failed = send_due_emails(batch_size=batch_size)
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                # Keep draining while there is a backlog.
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sent {total_sent} emails; {total_failed} failed attempts."
+            )
+        )
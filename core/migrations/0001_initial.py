@@ -0,0 +1,30 @@
+# Generated by Django 4.2.26 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('kind', models.CharField(choices=[('booking', 'Bookings'), ('comment', 'Comments'), ('blogger_request', 'Blogger requests')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['day', 'kind'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivityrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'kind'), name='unique_daily_activity_rollup'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -1,2 +1,150 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 
-# Create your models here.
+
+class DailyActivityRollup(models.Model):
+    """Pre-aggregated per-day counts for the admin charts and reporting."""
+
+    BOOKING = 'booking'
+    COMMENT = 'comment'
+    BLOGGER_REQUEST = 'blogger_request'
+    KIND_CHOICES = [
+        (BOOKING, 'Bookings'),
+        (COMMENT, 'Comments'),
+        (BLOGGER_REQUEST, 'Blogger requests'),
+    ]
+
+    day = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'kind']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'kind'],
+                name='unique_daily_activity_rollup',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} on {self.day}: {self.count}"
+
+    @classmethod
+    def bump(cls, kind, day, delta=1):
+        """Adjust the counter for ``kind`` on ``day`` by ``delta`` atomically."""
+        rows = cls.objects.filter(day=day, kind=kind)
+        if delta < 0:
+            rows.filter(count__gte=-delta).update(count=F('count') + delta)
+            return
+        if rows.update(count=F('count') + delta):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(day=day, kind=kind, count=delta)
+        except IntegrityError:
+            # Another writer created the row first; fall back to incrementing it.
+            rows.update(count=F('count') + delta)
+
+
+class EmailOutbox(models.Model):
+    """An email queued in the same transaction as the change that caused it.
+
+    Requests only insert rows; ``manage.py send_outbox`` delivers them (see
+    ``core.outbox``), so SMTP latency and outages never reach a request.
+    """
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set by the sender that has leased the row (see core.outbox).
+    claimed_by = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        verbose_name = 'queued email'
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status='pending'),
+                name='email_outbox_due_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+class Job(models.Model):
+    """A unit of background work run by ``manage.py run_worker``.
+
+    ``name`` refers to a function registered with ``core.jobs.register_job``
+    and ``payload`` holds its keyword arguments. See ``core.jobs``.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # While queued or running, at most one job may hold a given key.
+    unique_key = models.CharField(max_length=150, null=True, blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(
+                fields=['run_at'],
+                condition=models.Q(status='queued'),
+                name='job_due_idx',
+            ),
+            models.Index(fields=['name', 'status'], name='job_name_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_job_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,138 @@
+"""Queue emails transactionally and deliver them from a worker.
+
+``queue_email`` inserts an ``EmailOutbox`` row, so it commits or rolls back
+together with the caller's own changes. ``send_due_emails`` (run by
+``manage.py send_outbox``) leases due rows in a short transaction, delivers
+them over one reused SMTP connection with no transaction open, and records
+the outcome in a second transaction. Failures are rescheduled with
+exponential backoff. Rows leased by a sender that died come due again once
+``CLAIM_LEASE`` has passed.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 60  # seconds; doubles after every failed attempt
+RETRY_MAX_DELAY = 60 * 60
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def queue_email(subject, body, recipients, html_body='', from_email=None):
+    """Queue an email for delivery by the outbox worker."""
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body or '',
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next try after ``attempts`` failures."""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def _message(entry, mail_connection):
+    message = EmailMultiAlternatives(
+        subject=entry.subject,
+        body=entry.body,
+        from_email=entry.from_email,
+        to=entry.recipients,
+        connection=mail_connection,
+    )
+    if entry.html_body:
+        message.attach_alternative(entry.html_body, 'text/html')
+    return message
+
+
+def _record_failure(entry, error, now):
+    entry.attempts += 1
+    entry.last_error = f"{type(error).__name__}: {error}"[:2000]
+    if entry.attempts >= MAX_ATTEMPTS:
+        entry.status = EmailOutbox.FAILED
+    else:
+        entry.next_attempt_at = now + timedelta(seconds=retry_delay(entry.attempts))
+
+
+def claim_due_emails(batch_size=50):
+    """Lease up to ``batch_size`` due emails to this caller and return them.
+
+    The conditional ``UPDATE`` pushes ``next_attempt_at`` past the lease, so
+    a concurrent sender (even on SQLite, which has no row locks) matches
+    none of the rows this one won. PostgreSQL also skips rows another
+    sender is claiming at the same moment.
+    """
+    claimer = secrets.token_hex(16)
+    now = timezone.now()
+    with transaction.atomic():
+        due = EmailOutbox.objects.filter(
+            status=EmailOutbox.PENDING,
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        pks = list(due.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return []
+        EmailOutbox.objects.filter(
+            pk__in=pks,
+            status=EmailOutbox.PENDING,
+            next_attempt_at__lte=now,
+        ).update(claimed_by=claimer, next_attempt_at=now + CLAIM_LEASE)
+    return list(
+        EmailOutbox.objects.filter(claimed_by=claimer, status=EmailOutbox.PENDING)
+        .order_by('next_attempt_at', 'id')
+    )
+
+
+def send_due_emails(batch_size=50):
+    """Deliver up to ``batch_size`` due emails; returns ``(sent, failed)``."""
+    entries = claim_due_emails(batch_size)
+    if not entries:
+        return 0, 0
+
+    # No transaction is open while talking to the relay.
+    now = timezone.now()
+    sent = failed = 0
+    mail_connection = get_connection()
+    try:
+        mail_connection.open()
+    except Exception as error:
+        # The relay is unreachable: push the whole batch back.
+        for entry in entries:
+            _record_failure(entry, error, now)
+        failed = len(entries)
+    else:
+        try:
+            for entry in entries:
+                try:
+                    _message(entry, mail_connection).send()
+                except Exception as error:
+                    _record_failure(entry, error, now)
+                    failed += 1
+                else:
+                    entry.status = EmailOutbox.SENT
+                    entry.sent_at = timezone.now()
+                    entry.attempts += 1
+                    entry.last_error = ''
+                    sent += 1
+        finally:
+            mail_connection.close()
+
+    for entry in entries:
+        entry.claimed_by = ''
+    with transaction.atomic():
+        EmailOutbox.objects.bulk_update(
+            entries,
+            ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'claimed_by'],
+        )
+    return sent, failed
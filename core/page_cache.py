@@ -0,0 +1,105 @@
+"""Full-page response cache for anonymous visitors."""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.middleware.csrf import get_token
+
+from .cache import bump_version, get_versions
+
+PAGE_CACHE_ALIAS = 'pages'
+
+
+def _page_cache():
+    return caches[PAGE_CACHE_ALIAS]
+
+
+def _group_version_key(group):
+    return f'page-group:{group}'
+
+
+def invalidate_page_group(*groups):
+    """Expire every cached page tagged with any of ``groups``."""
+    cache = _page_cache()
+    for group in groups:
+        bump_version(cache, _group_version_key(group))
+
+
+def _page_key(request, groups, vary_cookies):
+    versions = get_versions(
+        _page_cache(),
+        [_group_version_key(group) for group in groups],
+    )
+    parts = [str(version) for version in versions.values()]
+    parts.append(request.get_full_path())
+    parts.extend(request.COOKIES.get(name, '') for name in vary_cookies)
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return f'page:{request.method}:{digest}'
+
+
+def _is_bypassed(request):
+    if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        return True
+    if request.method not in ('GET', 'HEAD'):
+        return True
+    if request.user.is_authenticated:
+        return True
+    # Pending flash messages are rendered into the page for this visitor only.
+    return bool(len(get_messages(request)))
+
+
+def _is_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # get_token() (e.g. a rendered {% csrf_token %}) flags the request;
+        # the token in the page is specific to this visitor.
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not response.has_header('Cache-Control')
+    )
+
+
+def cache_anonymous_page(groups, timeout=None, vary_cookies=(), csrf_cookie=False):
+    """Serve identical anonymous responses from the ``pages`` cache.
+
+    ``groups`` is a list of invalidation tags, or a callable receiving the
+    view arguments and returning one. Pages are keyed on the full path (plus
+    any ``vary_cookies``) and the current version of each group, so
+    ``invalidate_page_group`` expires them without knowing their URLs.
+
+    Authenticated requests, pending messages, responses that set cookies and
+    responses that rendered a CSRF token are never stored. ``csrf_cookie``
+    makes sure the CSRF cookie is still issued for pages whose scripts read
+    the token from it.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if _is_bypassed(request):
+                return view_func(request, *args, **kwargs)
+
+            page_groups = groups(request, *args, **kwargs) if callable(groups) else groups
+            key = _page_key(request, page_groups, vary_cookies)
+            cache = _page_cache()
+            response = cache.get(key)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if _is_cacheable(request, response):
+                    page_timeout = (
+                        timeout
+                        if timeout is not None
+                        else getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+                    )
+                    cache.set(key, response, page_timeout)
+
+            if csrf_cookie:
+                get_token(request)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,71 @@
+# core/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from blog.models import Comment, Post
+from bookings.models import Booking
+from services.models import Service
+from users.models import BloggerRequest
+
+from .models import DailyActivityRollup
+from .page_cache import invalidate_page_group
+
+ROLLUP_KINDS = {
+    Booking: DailyActivityRollup.BOOKING,
+    Comment: DailyActivityRollup.COMMENT,
+    BloggerRequest: DailyActivityRollup.BLOGGER_REQUEST,
+}
+
+
+def _rollup_day(instance):
+    created_at = getattr(instance, 'created_at', None)
+    if created_at is None:
+        return None
+    return timezone.localdate(created_at)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=BloggerRequest)
+def increment_daily_rollup(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    day = _rollup_day(instance)
+    if day is not None:
+        DailyActivityRollup.bump(ROLLUP_KINDS[sender], day)
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=BloggerRequest)
+def decrement_daily_rollup(sender, instance, **kwargs):
+    day = _rollup_day(instance)
+    if day is not None:
+        DailyActivityRollup.bump(ROLLUP_KINDS[sender], day, delta=-1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_page_group('blog-list', f'post:{instance.slug}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    slug = Post.objects.filter(pk=instance.post_id).values_list('slug', flat=True).first()
+    if slug is not None:
+        invalidate_page_group(f'post:{slug}')
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_page_group('services')
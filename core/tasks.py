@@ -0,0 +1,23 @@
+"""Background jobs for ``manage.py run_worker`` (see core.jobs)."""
+from datetime import timedelta
+
+from django.core.management import call_command
+
+from .jobs import prune_jobs, register_job
+from .outbox import send_due_emails
+
+
+@register_job('core.send_outbox', every=timedelta(seconds=30))
+def send_outbox(batch_size=50):
+    while any(send_due_emails(batch_size=batch_size)):
+        pass
+
+
+@register_job('core.purge_sessions', every=timedelta(hours=24))
+def purge_sessions():
+    call_command('purge_sessions')
+
+
+@register_job('core.prune_jobs', every=timedelta(hours=24))
+def prune_finished_jobs():
+    prune_jobs()
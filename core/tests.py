@@ -1,7 +1,35 @@
-from django.http import HttpResponseNotAllowed
-from django.test import RequestFactory, SimpleTestCase, override_settings
+import contextlib
+import socketserver
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.template import RequestContext, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from blog.models import Comment, Post
+from bookings.models import Booking, CartItem, GuestCheckout
+from config.dashboard import (
+	compute_dashboard_metrics,
+	get_dashboard_metrics,
+	invalidate_dashboard_metrics,
+)
+from services.models import Service
+from users.models import CustomUser
+from users.views import send_verification_email
 
 from .middleware import CustomErrorPageMiddleware
+from . import jobs
+from .cache import NamespacedCache
+from .models import DailyActivityRollup, EmailOutbox, Job
+from .outbox import MAX_ATTEMPTS, claim_due_emails, queue_email, send_due_emails
+from .page_cache import PAGE_CACHE_ALIAS, cache_anonymous_page
 
 
 @override_settings(
@@ -29,3 +57,500 @@ class ErrorPageTests(SimpleTestCase):
 		self.assertEqual(rendered.status_code, 405)
 		self.assertIn('Method not allowed', rendered.content.decode())
 		self.assertEqual(rendered['Allow'], 'GET')
+
+
+class AdminDashboardMetricsTests(TestCase):
+	def setUp(self):
+		invalidate_dashboard_metrics()
+		self.addCleanup(invalidate_dashboard_metrics)
+
+	def test_chart_series_groups_by_day(self):
+		service = Service.objects.create(name='Mowing')
+		Booking.objects.create(service=service, date=timezone.localdate())
+		Booking.objects.create(service=service, date=timezone.localdate())
+
+		metrics = compute_dashboard_metrics()
+
+		self.assertEqual(len(metrics['charts']['labels']), 7)
+		self.assertEqual(metrics['charts']['bookings'][-1], 2)
+		self.assertEqual(sum(metrics['charts']['bookings']), 2)
+		self.assertEqual(metrics['cards']['pending_bookings'], 2)
+
+	def test_metrics_are_memoized_until_invalidated(self):
+		get_dashboard_metrics()
+		with self.assertNumQueries(0):
+			get_dashboard_metrics()
+
+		invalidate_dashboard_metrics()
+		with self.assertNumQueries(6):
+			get_dashboard_metrics()
+
+
+class NamespacedCacheTests(SimpleTestCase):
+	def setUp(self):
+		cache.clear()
+		self.store = NamespacedCache('tests', timeout=60, stale_timeout=60)
+
+	def test_get_or_set_counts_hits_and_misses(self):
+		calls = []
+
+		def producer():
+			calls.append(1)
+			return len(calls)
+
+		self.assertEqual(self.store.get_or_set('answer', producer), 1)
+		self.assertEqual(self.store.get_or_set('answer', producer), 1)
+
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(self.store.stats(), {'hits': 1, 'misses': 1, 'stale': 0})
+
+	def test_invalidate_bumps_namespace_version(self):
+		self.store.set('answer', 1)
+		old_key = self.store.key('answer')
+
+		self.store.invalidate()
+
+		self.assertNotEqual(self.store.key('answer'), old_key)
+		self.assertIsNone(self.store.get('answer'))
+
+	def test_stale_value_served_while_another_caller_recomputes(self):
+		self.store.set('answer', 'old', timeout=-1)
+		cache.add(f"{self.store.key('answer')}:lock", 1)
+
+		value = self.store.get_or_set('answer', lambda: 'new')
+
+		self.assertEqual(value, 'old')
+		self.assertEqual(self.store.stats()['stale'], 1)
+
+	def test_expired_value_is_recomputed_by_lock_holder(self):
+		self.store.set('answer', 'old', timeout=-1)
+
+		self.assertEqual(self.store.get_or_set('answer', lambda: 'new'), 'new')
+		self.assertEqual(self.store.get('answer'), 'new')
+
+
+class DailyActivityRollupTests(TestCase):
+	def setUp(self):
+		self.service = Service.objects.create(name='Mowing')
+		self.today = timezone.localdate()
+
+	def _booking_count(self):
+		row = DailyActivityRollup.objects.filter(
+			day=self.today,
+			kind=DailyActivityRollup.BOOKING,
+		).first()
+		return row.count if row else 0
+
+	def test_signals_keep_rollup_in_sync(self):
+		first = Booking.objects.create(service=self.service, date=self.today)
+		Booking.objects.create(service=self.service, date=self.today)
+		self.assertEqual(self._booking_count(), 2)
+
+		first.status = 'approved'
+		first.save()
+		self.assertEqual(self._booking_count(), 2)
+
+		first.delete()
+		self.assertEqual(self._booking_count(), 1)
+
+	def test_rebuild_rollups_backfills_from_source_tables(self):
+		Booking.objects.create(service=self.service, date=self.today)
+		DailyActivityRollup.objects.all().delete()
+
+		call_command('rebuild_rollups', stdout=StringIO())
+
+		self.assertEqual(self._booking_count(), 1)
+
+
+@override_settings(
+	STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+	PAGE_CACHE_ENABLED=True,
+)
+class AnonymousPageCacheTests(TestCase):
+	def setUp(self):
+		caches[PAGE_CACHE_ALIAS].clear()
+		self.author = CustomUser.objects.create_user('writer', password='pw')
+		self.post = Post.objects.create(
+			title='First',
+			slug='first',
+			author=self.author,
+			content='Body',
+			status='published',
+		)
+
+	def test_anonymous_list_is_served_from_cache(self):
+		self.client.get('/blog/')
+		with self.assertNumQueries(0):
+			response = self.client.get('/blog/')
+		self.assertContains(response, 'First')
+
+	def test_publishing_a_post_invalidates_list(self):
+		self.client.get('/blog/')
+		Post.objects.create(
+			title='Second',
+			slug='second',
+			author=self.author,
+			content='Body',
+			status='published',
+		)
+		self.assertContains(self.client.get('/blog/'), 'Second')
+
+	def test_approving_a_comment_refreshes_the_listed_count(self):
+		comment = Comment.objects.create(post=self.post, name='Reader', content='Nice')
+		self.assertContains(self.client.get('/blog/'), '0 comments')
+
+		comment.approved = True
+		comment.save()
+
+		self.assertContains(self.client.get('/blog/'), '1 comment')
+
+	def test_post_detail_is_cached_and_sets_csrf_cookie(self):
+		self.client.get('/blog/first/')
+		self.client.cookies.clear()
+		with self.assertNumQueries(0):
+			response = self.client.get('/blog/first/')
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('csrftoken', response.cookies)
+		self.assertContains(response, 'data-csrf-from-cookie')
+
+	def test_service_change_invalidates_services_page(self):
+		service = Service.objects.create(name='Mowing')
+		self.client.get('/services/')
+		response = self.client.get('/services/')
+		self.assertEqual(response.templates, [])
+
+		service.name = 'Hedge trimming'
+		service.save()
+		response = self.client.get('/services/')
+		self.assertTemplateUsed(response, 'services/services_home.html')
+
+	def test_pages_that_render_a_csrf_token_are_not_stored(self):
+		calls = []
+
+		@cache_anonymous_page(['tests'])
+		def form_view(request):
+			calls.append(request)
+			template = Template('<form>{% csrf_token %}</form>')
+			return HttpResponse(template.render(RequestContext(request)))
+
+		for _ in range(2):
+			request = RequestFactory().get('/form/')
+			request.user = AnonymousUser()
+			self.assertContains(form_view(request), 'csrfmiddlewaretoken')
+		self.assertEqual(len(calls), 2)
+
+	def test_authenticated_requests_bypass_cache(self):
+		self.client.get('/blog/')
+		self.client.force_login(self.author)
+		response = self.client.get('/blog/')
+		self.assertTemplateUsed(response, 'blog/post_list.html')
+
+
+class PurgeSessionsTests(TestCase):
+	def _session(self, key, expires_in):
+		return Session.objects.create(
+			session_key=key,
+			session_data='',
+			expire_date=timezone.now() + expires_in,
+		)
+
+	def test_purges_expired_sessions_and_their_guest_carts(self):
+		service = Service.objects.create(name='Mowing')
+		for index in range(3):
+			self._session(f'expired{index}', -timedelta(days=1))
+			CartItem.objects.create(service=service, session_id=f'expired{index}')
+		self._session('live', timedelta(days=1))
+		CartItem.objects.create(service=service, session_id='live')
+		# Left behind when clearsessions deleted its session.
+		CartItem.objects.create(service=service, session_id='cleared')
+		GuestCheckout.objects.create(fingerprint='recent')
+		old = GuestCheckout.objects.create(fingerprint='old')
+		GuestCheckout.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+		out = StringIO()
+		call_command('purge_sessions', batch_size=2, stdout=out)
+
+		self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+		self.assertEqual(list(CartItem.objects.values_list('session_id', flat=True)), ['live'])
+		self.assertEqual(list(GuestCheckout.objects.values_list('fingerprint', flat=True)), ['recent'])
+		self.assertIn(
+			'Deleted 3 expired sessions, 4 guest cart items and 1 guest checkout markers.',
+			out.getvalue(),
+		)
+
+
+	@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+	def test_without_a_session_table_old_guest_rows_are_purged(self):
+		service = Service.objects.create(name='Mowing')
+		old = CartItem.objects.create(service=service, session_id='old')
+		CartItem.objects.filter(pk=old.pk).update(added_at=timezone.now() - timedelta(days=60))
+		CartItem.objects.create(service=service, session_id='recent')
+
+		call_command('purge_sessions', stdout=StringIO())
+
+		self.assertEqual(list(CartItem.objects.values_list('session_id', flat=True)), ['recent'])
+
+class _SMTPStandInHandler(socketserver.StreamRequestHandler):
+	"""Just enough SMTP for smtplib: records messages, rejects listed recipients."""
+
+	def _reply(self, line):
+		self.wfile.write(f'{line}\r\n'.encode())
+
+	def handle(self):
+		server = self.server
+		server.connections += 1
+		self._reply('220 localhost SMTP stand-in')
+		recipients, lines, in_data = [], [], False
+		while True:
+			raw = self.rfile.readline()
+			if not raw:
+				return
+			line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+			if in_data:
+				if line == '.':
+					server.messages.append((recipients, '\n'.join(lines)))
+					recipients, lines, in_data = [], [], False
+					self._reply('250 OK')
+				else:
+					lines.append(line)
+				continue
+			command = line[:4].upper()
+			if command == 'RCPT' and any(bad in line for bad in server.rejected):
+				self._reply('550 No such user')
+			elif command == 'RCPT':
+				recipients.append(line)
+				self._reply('250 OK')
+			elif command == 'DATA':
+				in_data = True
+				self._reply('354 End data with <CR><LF>.<CR><LF>')
+			elif command == 'QUIT':
+				self._reply('221 Bye')
+				return
+			else:
+				self._reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+	def __init__(self):
+		super().__init__(('127.0.0.1', 0), _SMTPStandInHandler)
+		self.connections = 0
+		self.messages = []
+		self.rejected = set()
+
+	def __enter__(self):
+		threading.Thread(target=self.serve_forever, daemon=True).start()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.shutdown()
+		self.server_close()
+
+
+class EmailOutboxTests(TestCase):
+	def setUp(self):
+		self.smtp = SMTPStandIn().__enter__()
+		self.addCleanup(self.smtp.__exit__)
+		settings_override = override_settings(
+			EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+			EMAIL_HOST='127.0.0.1',
+			EMAIL_PORT=self.smtp.server_address[1],
+			EMAIL_USE_TLS=False,
+			EMAIL_HOST_USER='',
+			EMAIL_HOST_PASSWORD='',
+		)
+		settings_override.enable()
+		self.addCleanup(settings_override.disable)
+
+	def test_batch_is_sent_over_one_connection(self):
+		for index in range(3):
+			queue_email('Hello', 'Body', [f'user{index}@example.com'], html_body='<p>Body</p>')
+
+		out = StringIO()
+		call_command('send_outbox', stdout=out)
+
+		self.assertEqual(len(self.smtp.messages), 3)
+		self.assertEqual(self.smtp.connections, 1)
+		self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.SENT).count(), 3)
+		self.assertIn('Sent 3 emails', out.getvalue())
+
+	def test_rejected_message_is_retried_with_backoff_then_failed(self):
+		self.smtp.rejected.add('bounce@example.com')
+		entry = queue_email('Hello', 'Body', ['bounce@example.com'])
+		queue_email('Hello', 'Body', ['ok@example.com'])
+
+		self.assertEqual(send_due_emails(), (1, 1))
+		entry.refresh_from_db()
+		self.assertEqual((entry.status, entry.attempts), (EmailOutbox.PENDING, 1))
+		self.assertGreater(entry.next_attempt_at, timezone.now())
+		self.assertEqual(send_due_emails(), (0, 0))
+
+		EmailOutbox.objects.filter(pk=entry.pk).update(
+			attempts=MAX_ATTEMPTS - 1,
+			next_attempt_at=timezone.now(),
+		)
+		send_due_emails()
+		entry.refresh_from_db()
+		self.assertEqual(entry.status, EmailOutbox.FAILED)
+		self.assertIn('SMTPRecipientsRefused', entry.last_error)
+
+	def test_a_claimed_batch_is_not_handed_to_a_second_sender(self):
+		for index in range(3):
+			queue_email('Hello', 'Body', [f'user{index}@example.com'])
+
+		first = claim_due_emails()
+		self.assertEqual(len(first), 3)
+		self.assertEqual(claim_due_emails(), [])
+		self.assertEqual(send_due_emails(), (0, 0))
+
+		# A sender that died leaves its lease to run out.
+		EmailOutbox.objects.update(next_attempt_at=timezone.now())
+		self.assertEqual(send_due_emails(), (3, 0))
+		self.assertEqual(len(self.smtp.messages), 3)
+		self.assertFalse(EmailOutbox.objects.exclude(claimed_by='').exists())
+
+	def test_unreachable_relay_reschedules_the_batch(self):
+		queue_email('Hello', 'Body', ['user@example.com'])
+		port = self.smtp.server_address[1]
+		self.smtp.__exit__()
+
+		with override_settings(EMAIL_PORT=port, EMAIL_TIMEOUT=1):
+			self.assertEqual(send_due_emails(), (0, 1))
+		self.assertEqual(EmailOutbox.objects.get().attempts, 1)
+
+	def test_verification_email_is_queued_not_sent(self):
+		user = CustomUser.objects.create_user('newbie', email='new@example.com', password='pw')
+		request = RequestFactory().get('/', HTTP_HOST='testserver')
+
+		send_verification_email(request, user)
+
+		self.assertEqual(self.smtp.messages, [])
+		entry = EmailOutbox.objects.get()
+		self.assertEqual(entry.recipients, ['new@example.com'])
+		self.assertIn('/users/verify/', entry.body)
+
+
+_job_calls = []
+
+
+@jobs.register_job('tests.record')
+def _record_job(value=None):
+	_job_calls.append(value)
+
+
+@jobs.register_job('tests.explode', max_attempts=2)
+def _explode_job():
+	raise RuntimeError('boom')
+
+
+@jobs.register_job('tests.tick', every=timedelta(minutes=5))
+def _tick_job():
+	_job_calls.append('tick')
+
+
+class JobQueueTests(TestCase):
+	def setUp(self):
+		_job_calls.clear()
+
+	def test_worker_runs_due_jobs_and_records_timing(self):
+		job = jobs.enqueue('tests.record', {'value': 7})
+		later = jobs.enqueue('tests.record', {'value': 8}, delay=timedelta(hours=1))
+
+		# The recurring core jobs run too and print their own summaries.
+		with contextlib.redirect_stdout(StringIO()):
+			call_command('run_worker', once=True, stdout=StringIO())
+
+		self.assertIn(7, _job_calls)
+		self.assertNotIn(8, _job_calls)
+		job.refresh_from_db()
+		self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+		self.assertIsNotNone(job.duration_ms)
+		self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+
+		out = StringIO()
+		call_command('run_worker', stats=True, stdout=out)
+		self.assertIn('tests.record: 1 runs, 0 failed', out.getvalue())
+
+	def test_failing_job_is_retried_with_backoff_then_failed(self):
+		job = jobs.enqueue('tests.explode')
+
+		with self.assertLogs('core.jobs', level='ERROR'):
+			jobs.run_job(jobs.claim_job('w1'))
+		job.refresh_from_db()
+		self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+		self.assertGreater(job.run_at, timezone.now())
+		self.assertIn('RuntimeError: boom', job.last_error)
+		self.assertIsNone(jobs.claim_job('w1'))
+
+		Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+		with self.assertLogs('core.jobs', level='ERROR'):
+			jobs.run_job(jobs.claim_job('w1'))
+		job.refresh_from_db()
+		self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+	def test_unique_key_dedupes_active_jobs(self):
+		first = jobs.enqueue('tests.record', unique_key='only-one')
+		self.assertIsNone(jobs.enqueue('tests.record', unique_key='only-one'))
+
+		jobs.run_job(jobs.claim_job('w1'))
+		self.assertEqual(Job.objects.get(pk=first.pk).status, Job.DONE)
+		self.assertIsNotNone(jobs.enqueue('tests.record', unique_key='only-one'))
+
+	def test_a_job_is_claimed_by_one_worker_only(self):
+		job = jobs.enqueue('tests.record')
+
+		claimed = jobs.claim_job('w1')
+		self.assertEqual((claimed.pk, claimed.locked_by), (job.pk, 'w1'))
+		self.assertIsNone(jobs.claim_job('w2'))
+
+		# A lock older than LOCK_TIMEOUT belongs to a dead worker.
+		Job.objects.filter(pk=job.pk).update(
+			locked_at=timezone.now() - jobs.LOCK_TIMEOUT - timedelta(seconds=1),
+		)
+		self.assertEqual(jobs.claim_job('w2').locked_by, 'w2')
+
+	def test_heartbeat_keeps_a_long_running_job_from_being_reclaimed(self):
+		jobs.enqueue('tests.record')
+		job = jobs.claim_job('w1')
+		Job.objects.filter(pk=job.pk).update(
+			locked_at=timezone.now() - jobs.LOCK_TIMEOUT - timedelta(seconds=1),
+		)
+
+		self.assertEqual(jobs.touch_job(job), 1)
+		self.assertIsNone(jobs.claim_job('w2'))
+
+	@override_settings(JOB_RETENTION_DAYS=7)
+	def test_prune_deletes_only_old_finished_jobs(self):
+		old_done = jobs.enqueue('tests.record')
+		old_failed = jobs.enqueue('tests.record')
+		recent = jobs.enqueue('tests.record')
+		queued = jobs.enqueue('tests.record')
+		Job.objects.filter(pk=old_done.pk).update(
+			status=Job.DONE, finished_at=timezone.now() - timedelta(days=8),
+		)
+		Job.objects.filter(pk=old_failed.pk).update(
+			status=Job.FAILED, finished_at=timezone.now() - timedelta(days=8),
+		)
+		Job.objects.filter(pk=recent.pk).update(
+			status=Job.DONE, finished_at=timezone.now() - timedelta(days=1),
+		)
+
+		self.assertEqual(jobs.prune_jobs(batch_size=1), 2)
+		self.assertEqual(
+			set(Job.objects.values_list('pk', flat=True)),
+			{recent.pk, queued.pk},
+		)
+
+	def test_recurring_job_schedules_its_next_run(self):
+		jobs.schedule_recurring_jobs()
+		jobs.schedule_recurring_jobs()
+		tick = Job.objects.get(name='tests.tick', status=Job.QUEUED)
+
+		Job.objects.exclude(pk=tick.pk).delete()
+		finished = jobs.run_job(jobs.claim_job('w1'))
+
+		self.assertEqual(_job_calls, ['tick'])
+		upcoming = Job.objects.get(name='tests.tick', status=Job.QUEUED)
+		self.assertEqual(upcoming.run_at, finished.finished_at + timedelta(minutes=5))
@@ -1,6 +1,9 @@
 from django.shortcuts import render
 
+from .page_cache import cache_anonymous_page
 
+
+@cache_anonymous_page(['core'])
 def home(request):
     """
     Homepage view: renders the homepage template.
@@ -8,6 +11,7 @@ def home(request):
     return render(request, 'core/home.html')
 
 
+@cache_anonymous_page(['core'])
 def contact(request):
     """
     Contact page view.
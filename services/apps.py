@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
+
+    def ready(self):
+        # Drop the cached price catalog whenever a service changes
+        from . import signals  # noqa: F401
@@ -0,0 +1,109 @@
+"""Process-local snapshot of ``services.Service``, versioned across workers."""
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import caches
+
+from core.cache import bump_version, get_version
+
+CATALOG_MAX_AGE = 300  # seconds; backstop in case the version key is lost
+CATALOG_CACHE_ALIAS = 'shared'
+CATALOG_VERSION_KEY = 'services:catalog-version'
+
+CatalogEntry = namedtuple('CatalogEntry', ['id', 'name', 'prices', 'image_url'])
+
+
+def _entry(service):
+    from .models import PRICE_FIELDS
+
+    return CatalogEntry(
+        id=service.pk,
+        name=service.name,
+        prices={size: getattr(service, field) for size, field in PRICE_FIELDS.items()},
+        image_url=service.image.url if service.image else None,
+    )
+
+
+class ServiceCatalog:
+    """Snapshot of every service's name, price matrix and image URL.
+
+    The snapshot is loaded with a single query on first use and shared by all
+    threads in the process. Its version lives in the ``shared`` cache, so
+    ``invalidate()`` (wired to ``Service`` save/delete signals) makes every
+    worker reload on its next lookup, not just the one that saved. An id
+    missing from the snapshot is read from the database rather than reported
+    as unknown.
+    """
+
+    def __init__(self, max_age=CATALOG_MAX_AGE, alias=CATALOG_CACHE_ALIAS):
+        self.max_age = max_age
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._entries = None
+        self._loaded_version = None
+        self._loaded_at = 0.0
+
+    @property
+    def version(self):
+        """The catalog version every worker currently agrees on."""
+        return get_version(caches[self.alias], CATALOG_VERSION_KEY)
+
+    def _is_fresh(self, version):
+        return (
+            self._entries is not None
+            and self._loaded_version == version
+            and time.monotonic() - self._loaded_at < self.max_age
+        )
+
+    def _load(self):
+        from .models import Service
+
+        return {service.pk: _entry(service) for service in Service.objects.all()}
+
+    def entries(self):
+        version = self.version
+        if self._is_fresh(version):
+            return self._entries
+        with self._lock:
+            if not self._is_fresh(version):
+                # Read before loading, so a save racing the load still
+                # leaves the snapshot marked out of date.
+                self._entries = self._load()
+                self._loaded_version = version
+                self._loaded_at = time.monotonic()
+            return self._entries
+
+    def _load_missing(self, service_id):
+        from .models import Service
+
+        service = Service.objects.filter(pk=service_id).first()
+        if service is None:
+            return None
+        entry = _entry(service)
+        with self._lock:
+            if self._entries is not None:
+                self._entries = {**self._entries, service_id: entry}
+        return entry
+
+    def get(self, service_id):
+        """Return the ``CatalogEntry`` for ``service_id`` or ``None``."""
+        if service_id is None:
+            return None
+        entry = self.entries().get(service_id)
+        if entry is None:
+            entry = self._load_missing(service_id)
+        return entry
+
+    def price(self, service_id, size):
+        """Return the price for ``size`` of ``service_id`` (``None`` if unset)."""
+        entry = self.get(service_id)
+        if entry is None:
+            return None
+        return entry.prices.get(size)
+
+    def invalidate(self):
+        bump_version(caches[self.alias], CATALOG_VERSION_KEY)
+
+
+catalog = ServiceCatalog()
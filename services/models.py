@@ -1,5 +1,11 @@
 from django.db import models
 
+PRICE_FIELDS = {
+    "small": "small_price",
+    "medium": "medium_price",
+    "large": "large_price",
+}
+
 
 class Service(models.Model):
     name = models.CharField(max_length=100)
@@ -30,9 +36,5 @@ class Service(models.Model):
         return self.name
 
     def get_price(self, size):
-        size_map = {
-            "small": self.small_price,
-            "medium": self.medium_price,
-            "large": self.large_price,
-        }
-        return size_map.get(size)
+        field = PRICE_FIELDS.get(size)
+        return getattr(self, field) if field else None
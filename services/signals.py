@@ -0,0 +1,16 @@
+# services/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import catalog
+from .models import Service
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_catalog(sender, **kwargs):
+    catalog.invalidate()
+    # Invalidate again once committed, in case another thread reloaded the
+    # catalog from pre-commit data in the meantime.
+    transaction.on_commit(catalog.invalidate)
@@ -10,9 +10,11 @@
 #     services = Service.objects.all()
 #     return render(request, "services/services.html", {"services": services})
 from django.shortcuts import render
+from core.page_cache import cache_anonymous_page
 from .models import Service
 
 
+@cache_anonymous_page(['services'], csrf_cookie=True)
 def services_home(request):
     """Display the primary services page from the services app."""
     services = Service.objects.all()
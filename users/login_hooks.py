@@ -0,0 +1,84 @@
+"""The ordered work done for a user right after they log in.
+
+``user_logged_in`` runs ``run_login_hooks`` once per login. Each hook in
+``LOGIN_HOOKS`` runs in turn inside a single transaction, so a failure
+leaves none of them half applied, and each hook's duration is recorded on
+``request.login_hook_timings`` and logged. Logins whose hooks take longer
+than ``LOGIN_HOOK_BUDGET_MS`` are logged as warnings.
+
+A hook may return a callable; those run in order once the transaction has
+committed. Anything the user sees (flashed messages) goes there, so a
+rolled-back login never shows work that did not happen.
+"""
+import logging
+import time
+from collections import namedtuple
+from functools import partial
+
+from django.db import transaction
+
+from bookings.utils import migrate_guest_cart_to_user
+
+from .models import CustomerProfile
+from .notifications import flash_notifications, take_login_notifications, unread_count
+
+logger = logging.getLogger(__name__)
+
+LOGIN_HOOK_BUDGET_MS = 250
+
+LoginHook = namedtuple('LoginHook', ['name', 'func'])
+HookTiming = namedtuple('HookTiming', ['name', 'duration_ms'])
+
+
+def merge_guest_cart(request, user):
+    migrate_guest_cart_to_user(request, user)
+
+
+def deliver_notifications(request, user):
+    texts = take_login_notifications(user)
+    return partial(flash_notifications, request, texts)
+
+
+def warm_profile(request, user):
+    """Make sure the customer profile exists and prime the unread badge."""
+    profile, _created = CustomerProfile.objects.get_or_create(user=user)
+    user.customerprofile = profile
+    unread_count(user)
+
+
+LOGIN_HOOKS = [
+    LoginHook('merge_guest_cart', merge_guest_cart),
+    LoginHook('deliver_notifications', deliver_notifications),
+    LoginHook('warm_profile', warm_profile),
+]
+
+
+def run_login_hooks(request, user, hooks=None):
+    """Run ``hooks`` (default: ``LOGIN_HOOKS``) for ``user`` in order.
+
+    Returns a ``HookTiming`` per hook, also stored on
+    ``request.login_hook_timings``.
+    """
+    timings = []
+    after_commit = []
+    with transaction.atomic():
+        for hook in LOGIN_HOOKS if hooks is None else hooks:
+            started = time.perf_counter()
+            follow_up = hook.func(request, user)
+            duration_ms = (time.perf_counter() - started) * 1000
+            timings.append(HookTiming(hook.name, duration_ms))
+            if follow_up is not None:
+                after_commit.append(follow_up)
+    for follow_up in after_commit:
+        follow_up()
+    request.login_hook_timings = timings
+
+    total_ms = sum(timing.duration_ms for timing in timings)
+    summary = ', '.join(f'{name}={duration:.1f}ms' for name, duration in timings)
+    if total_ms > LOGIN_HOOK_BUDGET_MS:
+        logger.warning(
+            "Login hooks for user %s took %.1fms (%s)", user.pk, total_ms, summary,
+        )
+    else:
+        logger.debug("Login hooks for user %s: %s", user.pk, summary)
+    return timings
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-18 18:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_bloggerrequest_post_usernotification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(condition=models.Q(('delivered', False)), fields=['user'], name='notification_pending_idx'),
+        ),
+    ]
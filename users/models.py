@@ -67,6 +67,16 @@ class UserNotification(models.Model):
     delivered = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Only pending rows are ever looked up per user.
+            models.Index(
+                fields=['user'],
+                condition=models.Q(delivered=False),
+                name='notification_pending_idx',
+            ),
+        ]
+
     def __str__(self):
         status = 'sent' if self.delivered else 'pending'
         return f"Notification for {self.user.username} ({status})"
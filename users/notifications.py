@@ -0,0 +1,91 @@
+"""The per-user notification inbox.
+
+``notify`` queues a message for a user. On login ``take_login_notifications``
+reads the newest pending messages with one query, marks at most
+``LOGIN_NOTIFICATION_LIMIT`` of them delivered and folds the rest into a
+single summary line; those stay unread until a later login shows them.
+``flash_notifications`` shows the result once the login has committed. ``unread_count``
+backs the navbar badge from a per-user cache entry that is dropped whenever
+the user's inbox changes.
+"""
+from django.contrib import messages
+from django.db.models import Count, Window
+
+from core.cache import NamespacedCache
+
+from .models import UserNotification
+
+LOGIN_NOTIFICATION_LIMIT = 5
+UNREAD_COUNT_TTL = 10 * 60  # seconds; writes drop the entry anyway
+
+# On the 'shared' alias so a write in one worker drops the entry everywhere.
+unread_cache = NamespacedCache('notifications', alias='shared', timeout=UNREAD_COUNT_TTL)
+
+
+def _unread_key(user_id):
+    return f'unread:{user_id}'
+
+
+def forget_unread_count(user_id):
+    unread_cache.delete(_unread_key(user_id))
+
+
+def unread_count(user):
+    """Return how many notifications ``user`` has not seen yet."""
+    return unread_cache.get_or_set(
+        _unread_key(user.pk),
+        lambda: UserNotification.objects.filter(user=user, delivered=False).count(),
+    )
+
+
+def notify(user, message):
+    """Queue ``message`` for ``user``'s next login."""
+    # The post_save receiver in users.signals drops the cached count.
+    return UserNotification.objects.create(user=user, message=message)
+
+
+def pending_notifications(user, limit=LOGIN_NOTIFICATION_LIMIT):
+    """Return ``(rows, total)`` for ``user``'s pending notifications.
+
+    ``rows`` holds ``(pk, message)`` for the newest ``limit`` of them; the
+    window count carries the overall total on the same query.
+    """
+    rows = list(
+        UserNotification.objects.filter(user=user, delivered=False)
+        .annotate(total=Window(Count('pk')))
+        .order_by('-pk')
+        .values_list('pk', 'message', 'total')[:limit]
+    )
+    total = rows[0][2] if rows else 0
+    return [(pk, message) for pk, message, _total in rows], total
+
+
+def take_login_notifications(user, limit=LOGIN_NOTIFICATION_LIMIT):
+    """Mark ``user``'s newest pending notifications delivered.
+
+    Returns the texts to flash: those notifications plus, when more are
+    pending, a summary line. Only the returned rows count as read; the rest
+    stay pending and are shown on later logins.
+    """
+    rows, total = pending_notifications(user, limit)
+    if not rows:
+        return []
+
+    texts = [message for _pk, message in rows]
+    hidden = total - len(rows)
+    if hidden:
+        texts.append(
+            f"You have {hidden} more unread notification{'s' if hidden != 1 else ''}."
+        )
+
+    UserNotification.objects.filter(
+        pk__in=[pk for pk, _message in rows],
+    ).update(delivered=True)
+    forget_unread_count(user.pk)
+    return texts
+
+
+def flash_notifications(request, texts):
+    for text in texts:
+        messages.info(request, text, fail_silently=True)
+
@@ -1,10 +1,10 @@
 
-from django.contrib import messages
 from django.contrib.auth.signals import user_logged_in
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from bookings.utils import migrate_guest_cart_to_user
+from .login_hooks import run_login_hooks
+from .notifications import forget_unread_count
 from .models import (
     BloggerProfile,
     BloggerRequest,
@@ -14,19 +14,17 @@ from .models import (
 )
 
 
-# 1. Migrate guest cart to user on login
+# 1. Merge the guest cart, deliver notifications and warm the profile
 @receiver(user_logged_in)
-def migrate_cart_on_login(sender, request, user, **kwargs):
-    migrate_guest_cart_to_user(request, user)
+def run_login_pipeline(sender, request, user, **kwargs):
+    run_login_hooks(request, user)
 
 
-# 1b. Surface queued notifications when the user logs in
-@receiver(user_logged_in)
-def deliver_login_notifications(sender, request, user, **kwargs):
-    pending = UserNotification.objects.filter(user=user, delivered=False)
-    for note in pending:
-        messages.info(request, note.message)
-    pending.update(delivered=True)
+# 1c. Keep the cached unread count in step with the inbox
+@receiver(post_save, sender=UserNotification)
+@receiver(post_delete, sender=UserNotification)
+def reset_unread_count(sender, instance, **kwargs):
+    forget_unread_count(instance.user_id)
 
 
 # 2. Auto-create CustomerProfile on user registration
@@ -1,2 +1,157 @@
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .login_hooks import LOGIN_HOOKS, LoginHook, deliver_notifications, run_login_hooks
+from .models import CustomerProfile, CustomUser, UserNotification
+from .notifications import (
+    LOGIN_NOTIFICATION_LIMIT,
+    notify,
+    pending_notifications,
+    unread_count,
+)
+
+
+class NotificationInboxTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.user = CustomUser.objects.create_user('reader', password='pw')
+
+    def _login(self):
+        response = self.client.post(
+            reverse('login'),
+            {'username': 'reader', 'password': 'pw'},
+        )
+        return [message.message for message in get_messages(response.wsgi_request)]
+
+    def test_login_shows_newest_notifications_and_summarizes_the_rest(self):
+        for index in range(LOGIN_NOTIFICATION_LIMIT + 3):
+            notify(self.user, f'note {index}')
+
+        shown = self._login()
+
+        newest = LOGIN_NOTIFICATION_LIMIT + 2
+        self.assertIn(f'note {newest}', shown)
+        self.assertNotIn('note 0', shown)
+        self.assertIn('You have 3 more unread notifications.', shown)
+        self.assertEqual(
+            set(UserNotification.objects.filter(delivered=False).values_list('message', flat=True)),
+            {'note 0', 'note 1', 'note 2'},
+        )
+        self.assertEqual(unread_count(self.user), 3)
+
+        self.client.logout()
+        self.assertIn('note 0', self._login())
+        self.assertEqual(unread_count(self.user), 0)
+
+    def test_pending_notifications_are_read_with_one_query(self):
+        for index in range(20):
+            notify(self.user, f'note {index}')
+
+        with self.assertNumQueries(1):
+            rows, total = pending_notifications(self.user)
+        self.assertEqual((len(rows), total), (LOGIN_NOTIFICATION_LIMIT, 20))
+
+    def test_unread_count_is_cached_and_reset_on_changes(self):
+        url = reverse('notification_unread_count')
+        self.client.force_login(self.user)
+        notify(self.user, 'first')
+
+        self.assertEqual(self.client.get(url).json(), {'unread': 1})
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.user), 1)
+
+        notify(self.user, 'second')
+        self.assertEqual(unread_count(self.user), 2)
+
+        self._login()
+        self.assertEqual(self.client.get(url).json(), {'unread': 0})
+
+    def test_unread_count_is_zero_for_anonymous_visitors(self):
+        response = self.client.get(reverse('notification_unread_count'))
+        self.assertEqual(response.json(), {'unread': 0})
+        self.assertIn('private', response['Cache-Control'])
+
+
+class LoginHookPipelineTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('reader', password='pw')
+        self.request = RequestFactory().get('/')
+
+    def test_hooks_run_in_order_and_are_timed(self):
+        calls = []
+        hooks = [
+            LoginHook('first', lambda request, user: calls.append('first')),
+            LoginHook('second', lambda request, user: calls.append('second')),
+        ]
+
+        timings = run_login_hooks(self.request, self.user, hooks)
+
+        self.assertEqual(calls, ['first', 'second'])
+        self.assertEqual([timing.name for timing in timings], ['first', 'second'])
+        self.assertEqual(self.request.login_hook_timings, timings)
+
+    def test_a_failing_hook_rolls_back_the_earlier_ones(self):
+        def fail(request, user):
+            raise RuntimeError('boom')
+
+        hooks = [
+            LoginHook('notify', lambda request, user: notify(user, 'hello')),
+            LoginHook('fail', fail),
+        ]
+
+        with self.assertRaises(RuntimeError):
+            run_login_hooks(self.request, self.user, hooks)
+        self.assertFalse(UserNotification.objects.exists())
+
+    def test_messages_are_flashed_only_after_the_hooks_commit(self):
+        flashed = []
+
+        def fail(request, user):
+            raise RuntimeError('boom')
+
+        hooks = [
+            LoginHook('flash', lambda request, user: lambda: flashed.append('hello')),
+            LoginHook('fail', fail),
+        ]
+        with self.assertRaises(RuntimeError):
+            run_login_hooks(self.request, self.user, hooks)
+        self.assertEqual(flashed, [])
+
+        run_login_hooks(self.request, self.user, hooks[:1])
+        self.assertEqual(flashed, ['hello'])
+
+    def test_rolled_back_delivery_shows_nothing(self):
+        notify(self.user, 'hello')
+        self.request.session = self.client.session
+        self.request._messages = FallbackStorage(self.request)
+
+        def fail(request, user):
+            raise RuntimeError('boom')
+
+        hooks = [
+            LoginHook('deliver_notifications', deliver_notifications),
+            LoginHook('fail', fail),
+        ]
+        with self.assertRaises(RuntimeError):
+            run_login_hooks(self.request, self.user, hooks)
+
+        self.assertEqual(list(get_messages(self.request)), [])
+        self.assertFalse(UserNotification.objects.get().delivered)
+
+    def test_login_runs_the_default_pipeline_once(self):
+        CustomerProfile.objects.filter(user=self.user).delete()
+
+        response = self.client.post(
+            reverse('login'),
+            {'username': 'reader', 'password': 'pw'},
+        )
+
+        timings = response.wsgi_request.login_hook_timings
+        self.assertEqual(
+            [timing.name for timing in timings],
+            [hook.name for hook in LOGIN_HOOKS],
+        )
+        self.assertTrue(CustomerProfile.objects.filter(user=self.user).exists())
@@ -26,4 +26,9 @@ urlpatterns = [
         views.submit_blogger_request,
         name='submit_blogger_request',
     ),
+    path(
+        'notifications/unread-count/',
+        views.notification_unread_count,
+        name='notification_unread_count',
+    ),
 ]
@@ -4,15 +4,20 @@ from django.contrib.auth import get_user_model, login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import send_mail
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.template.loader import render_to_string
 from django.utils.encoding import force_bytes
 from django.utils.html import strip_tags
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.views.decorators.cache import cache_control
+
+from core.outbox import queue_email
 
 from .forms import BloggerRequestForm, RegistrationForm
 from .models import BloggerRequest
+from .notifications import unread_count
 
 User = get_user_model()
 
@@ -28,11 +33,12 @@ def register_view(request):
     if request.method == "POST":
         form = RegistrationForm(request.POST)
         if form.is_valid():
-            user = form.save(commit=False)
-            user.is_active = False
-            user.email_verified = False
-            user.save()
-            send_verification_email(request, user)
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.is_active = False
+                user.email_verified = False
+                user.save()
+                send_verification_email(request, user)
             messages.success(
                 request,
                 (
@@ -47,38 +53,35 @@ def register_view(request):
 
 
 def send_verification_email(request, user):
-    try:
-        token = default_token_generator.make_token(user)
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        domain = get_current_site(request).domain
-        verify_url = f"http://{domain}/users/verify/{uid}/{token}/"
-        home_url = f"http://{domain}/"
-        subject = "Verify your email address"
-        html_message = render_to_string(
-            "email/verify_email.html",
-            {
-                "user": user,
-                "verify_url": verify_url,
-                "home_url": home_url,
-            },
-        )
-        plain_message = strip_tags(html_message)
-        from_email = (
-            settings.EMAIL_HOST_USER
-            if hasattr(settings, 'EMAIL_HOST_USER')
-            else "noreply@example.com"
-        )
+    """Queue the verification email; ``send_outbox`` delivers it."""
+    token = default_token_generator.make_token(user)
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    domain = get_current_site(request).domain
+    verify_url = f"http://{domain}/users/verify/{uid}/{token}/"
+    home_url = f"http://{domain}/"
+    subject = "Verify your email address"
+    html_message = render_to_string(
+        "email/verify_email.html",
+        {
+            "user": user,
+            "verify_url": verify_url,
+            "home_url": home_url,
+        },
+    )
+    plain_message = strip_tags(html_message)
+    from_email = (
+        settings.EMAIL_HOST_USER
+        if hasattr(settings, 'EMAIL_HOST_USER')
+        else "noreply@example.com"
+    )
 
-        send_mail(
-            subject,
-            plain_message,
-            from_email,
-            [user.email],
-            fail_silently=False,
-            html_message=html_message,
-        )
-    except Exception:
-        raise
+    queue_email(
+        subject,
+        plain_message,
+        [user.email],
+        html_body=html_message,
+        from_email=from_email,
+    )
 
 
 def verify_email(request, uidb64, token):
@@ -153,4 +156,14 @@ def submit_blogger_request(request):
         form = BloggerRequestForm()
     return render(request, "dashboard/blogger_request.html", {"form": form})
 
+
+# --------------------------
+# Notification Badge
+# --------------------------
+@cache_control(private=True, no_cache=True)
+def notification_unread_count(request):
+    """JSON unread-notification count for the navbar badge (0 when anonymous)."""
+    count = unread_count(request.user) if request.user.is_authenticated else 0
+    return JsonResponse({"unread": count})
+
 # Create your views here.